@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for image embed rewriting.
+Compares the old two-regex, replace-per-match rewriter with the single-pass
+rewrite_embeds() on synthetic notes containing hundreds of embeds.
+"""
+
+import argparse
+import random
+import re
+import timeit
+from pathlib import Path
+
+from obsidian_hugo import rewrite_embeds
+
+
+def legacy_rewrite(content, resolve):
+    """The pre-rewrite_embeds algorithm, kept here for comparison."""
+    image_patterns = [
+        r"!\[([^\]]*)\]\(([^)]+)\)",
+        r"!\[\[([^\]]+)\]\]",
+    ]
+
+    processed_content = content
+
+    for pattern in image_patterns:
+        for match in re.finditer(pattern, content):
+            if pattern.endswith(r"\]\]"):
+                image_path = match.group(1)
+                alt_text = Path(image_path).stem
+            else:
+                alt_text = match.group(1)
+                image_path = match.group(2)
+
+            url = resolve(image_path)
+            if url is None:
+                continue
+
+            processed_content = processed_content.replace(
+                match.group(0), f"![{alt_text}]({url})"
+            )
+
+    return processed_content
+
+
+def make_note(embeds, distinct, paragraph_words=60, seed=0):
+    """Build a note with the given number of embeds over distinct targets."""
+    rng = random.Random(seed)
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "vault", "hugo", "sync"]
+    parts = ["---\ntitle: Bench\n---\n"]
+    for i in range(embeds):
+        parts.append(" ".join(rng.choice(words) for _ in range(paragraph_words)))
+        target = f"attachments/image-{rng.randrange(distinct)}.png"
+        if i % 2:
+            parts.append(f"![[{target}]]")
+        else:
+            parts.append(f"![figure {i}]({target})")
+    return "\n\n".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark image embed rewriting")
+    parser.add_argument(
+        "--embeds",
+        type=int,
+        nargs="+",
+        default=[100, 300, 1000],
+        help="Embed counts to benchmark (default: 100 300 1000)",
+    )
+    parser.add_argument(
+        "--distinct",
+        type=float,
+        default=0.5,
+        help="Fraction of embeds with a distinct target (default: 0.5)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Timing repetitions (default: 5)"
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'embeds':>8} {'legacy ms':>10} {'single ms':>10} {'speedup':>8} "
+        f"{'legacy resolves':>16} {'single resolves':>16}"
+    )
+
+    for embeds in args.embeds:
+        note = make_note(embeds, max(1, int(embeds * args.distinct)))
+        counts = {}
+
+        def resolve(target, name):
+            counts[name] = counts.get(name, 0) + 1
+            return "/images/" + target.rsplit("/", 1)[-1]
+
+        legacy_out = legacy_rewrite(note, lambda t: resolve(t, "legacy"))
+        single_out = rewrite_embeds(note, lambda t: resolve(t, "single"))
+        if legacy_out != single_out:
+            print(f"  ! outputs differ for {embeds} embeds")
+
+        legacy = min(
+            timeit.repeat(
+                lambda: legacy_rewrite(note, lambda t: resolve(t, "_")),
+                number=1,
+                repeat=args.repeat,
+            )
+        )
+        single = min(
+            timeit.repeat(
+                lambda: rewrite_embeds(note, lambda t: resolve(t, "_")),
+                number=1,
+                repeat=args.repeat,
+            )
+        )
+
+        print(
+            f"{embeds:>8} {legacy * 1000:>10.2f} {single * 1000:>10.2f} "
+            f"{legacy / single:>7.1f}x {counts['legacy']:>16} {counts['single']:>16}"
+        )
+
+
+if __name__ == "__main__":
+    main()
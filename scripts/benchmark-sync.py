@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Synthetic-vault benchmark for the Obsidian to Hugo sync engines.
+Generates a vault with a configurable number of posts, note size, embed
+density and attachment size, then times cold, warm and single-edit syncs plus
+the individual stages against both ObsidianHugoSync classes. Results are
+written as JSON so runs can be compared across commits.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from obsidian_hugo import load_sync_engine, read_source
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+ENGINES = {
+    "obsidian-sync": SCRIPTS_DIR / "obsidian-sync.py",
+    "sync-obsidian-blog": SCRIPTS_DIR / "sync-obsidian-blog.py",
+}
+WORDS = "obsidian hugo vault note sync image post draft tag link page site".split()
+
+
+def generate_vault(root, args):
+    """Write a synthetic vault under root and return its path."""
+    rng = random.Random(args.seed)
+    vault = root / "vault"
+    posts_dir = vault / "blog" / "posts"
+    attaches_dir = vault / "attaches"
+    notes_dir = vault / "notes"
+    for directory in (posts_dir, attaches_dir, notes_dir, vault / ".obsidian"):
+        directory.mkdir(parents=True, exist_ok=True)
+
+    attachments = []
+    for i in range(args.attachments):
+        name = f"attachment-{i:04d}.png"
+        (attaches_dir / name).write_bytes(rng.randbytes(args.attachment_kb * 1024))
+        attachments.append(name)
+
+    def body(size_kb, embeds):
+        words_needed = size_kb * 1024 // 7
+        paragraphs = []
+        for i in range(max(embeds, 1)):
+            count = words_needed // max(embeds, 1)
+            paragraphs.append(" ".join(rng.choice(WORDS) for _ in range(count)))
+            if i < embeds and attachments:
+                name = rng.choice(attachments)
+                paragraphs.append(
+                    f"![[{name}]]" if i % 2 else f"![figure {i}](../../attaches/{name})"
+                )
+        return "\n\n".join(paragraphs) + "\n"
+
+    for i in range(args.posts):
+        # Most posts carry front matter; the rest rely on a #blog tag
+        if i % 4:
+            header = f"---\ntitle: Post {i}\ndate: 2025-01-01\n---\n\n"
+        else:
+            header = "#blog\n\n"
+        (posts_dir / f"post-{i:05d}.md").write_text(
+            header + body(args.note_kb, args.embeds), encoding="utf-8"
+        )
+
+    for i in range(args.notes):
+        (notes_dir / f"note-{i:05d}.md").write_text(
+            body(args.note_kb, 0), encoding="utf-8"
+        )
+
+    return vault
+
+
+def build_engine(name, vault, work):
+    """Instantiate one engine writing into work/."""
+    module = load_sync_engine(ENGINES[name], module_name=name.replace("-", "_"))
+    state = work / ".obsidian-sync"
+    if name == "obsidian-sync":
+        return module.ObsidianHugoSync(
+            obsidian_vault_path=vault,
+            hugo_content_path=work / "content",
+            hugo_static_path=work / "static",
+            manifest_path=state / "manifest.json",
+            classify_cache_path=state / "classify-cache.json",
+        )
+    return module.ObsidianHugoSync(
+        obsidian_blog_path=vault / "blog",
+        hugo_content_path=work / "content",
+        hugo_static_path=work / "static",
+        manifest_path=state / "blog-manifest.json",
+    )
+
+
+def timed(func, verbose):
+    """Run func, silencing its console output unless verbose."""
+    if verbose:
+        sink = contextlib.nullcontext()
+    else:
+        sink = contextlib.redirect_stdout(io.StringIO())
+    with sink:
+        started = time.perf_counter()
+        func()
+        return time.perf_counter() - started
+
+
+def bench_engine(name, vault, root, args):
+    """Time every scenario for one engine; returns {scenario: [seconds]}."""
+    samples = {}
+
+    def record(scenario, seconds):
+        samples.setdefault(scenario, []).append(seconds)
+
+    edit_target = vault / "blog" / "posts" / "post-00001.md"
+    for run in range(args.repeat):
+        work = root / f"out-{name}-{run}"
+
+        # Cold: empty output and state; includes building the engine
+        engine = None
+
+        def cold():
+            nonlocal engine
+            engine = build_engine(name, vault, work)
+            engine.sync_all(jobs=args.jobs)
+
+        record("cold", timed(cold, args.verbose))
+
+        # Warm: a fresh process would reload the persisted state
+        def warm():
+            build_engine(name, vault, work).sync_all(jobs=args.jobs)
+
+        record("warm", timed(warm, args.verbose))
+
+        # Single edit: one post changes, everything else is fresh
+        with open(edit_target, "a", encoding="utf-8") as handle:
+            handle.write(f"\nEdit {run}\n")
+
+        def single_edit():
+            build_engine(name, vault, work).sync_all(jobs=args.jobs)
+
+        record("single-edit", timed(single_edit, args.verbose))
+
+        # Stages, measured on the warm engine
+        record(
+            "stage:find_blog_posts",
+            timed(engine.find_blog_posts, args.verbose),
+        )
+        posts = engine.find_blog_posts()[: args.stage_sample]
+        notes = [(post, read_source(post)[0]) for post in posts]
+
+        if hasattr(engine, "is_blog_post"):
+            record(
+                "stage:is_blog_post",
+                timed(lambda: [engine.is_blog_post(p) for p, _ in notes], args.verbose),
+            )
+        record(
+            "stage:process_images",
+            timed(
+                lambda: [engine.process_images(text, p) for p, text in notes],
+                args.verbose,
+            ),
+        )
+        if hasattr(engine, "process_front_matter"):
+            record(
+                "stage:process_front_matter",
+                timed(
+                    lambda: [engine.process_front_matter(t, p) for p, t in notes],
+                    args.verbose,
+                ),
+            )
+
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+    return samples
+
+
+def git_revision():
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=SCRIPTS_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    previous = {}
+    if baseline:
+        for row in baseline["results"]:
+            previous[(row["engine"], row["scenario"])] = row["median"]
+
+    print(
+        f"\n{'engine':<20} {'scenario':<28} "
+        f"{'median ms':>10} {'min ms':>10} {'vs base':>9}"
+    )
+    for row in results:
+        base = previous.get((row["engine"], row["scenario"]))
+        delta = f"{(row['median'] / base - 1) * 100:+.1f}%" if base else ""
+        print(
+            f"{row['engine']:<20} {row['scenario']:<28} "
+            f"{row['median'] * 1000:>10.1f} {row['min'] * 1000:>10.1f} {delta:>9}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Obsidian to Hugo sync engines on a synthetic vault"
+    )
+    parser.add_argument("--posts", type=int, default=500, help="Number of blog posts")
+    parser.add_argument(
+        "--notes", type=int, default=500, help="Number of non-post vault notes"
+    )
+    parser.add_argument("--note-kb", type=int, default=8, help="Approximate note size")
+    parser.add_argument("--embeds", type=int, default=5, help="Image embeds per post")
+    parser.add_argument(
+        "--attachments", type=int, default=200, help="Number of vault attachments"
+    )
+    parser.add_argument(
+        "--attachment-kb", type=int, default=256, help="Size of each attachment"
+    )
+    parser.add_argument(
+        "--engine",
+        choices=sorted(ENGINES),
+        action="append",
+        help="Engine to benchmark (default: both)",
+    )
+    parser.add_argument("--jobs", type=int, default=1, help="Passed to sync_all")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario")
+    parser.add_argument(
+        "--stage-sample", type=int, default=100, help="Posts used for stage timings"
+    )
+    parser.add_argument("--seed", type=int, default=1, help="Vault generator seed")
+    parser.add_argument(
+        "--output",
+        default="benchmark-results.json",
+        help="Where to write the JSON results",
+    )
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    parser.add_argument("--workdir", help="Directory for the vault (default: temp)")
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the generated vault and outputs"
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Show the engines' own output"
+    )
+
+    args = parser.parse_args()
+
+    # Only a directory made for this run may be removed as a whole; in an
+    # existing --workdir just the vault and outputs generated here are
+    if args.workdir:
+        root = Path(args.workdir)
+        created_root = not root.exists()
+        root.mkdir(parents=True, exist_ok=True)
+    else:
+        root = Path(tempfile.mkdtemp(prefix="sync-bench-"))
+        created_root = True
+    try:
+        print(f"Generating vault in {root}...")
+        vault = generate_vault(root, args)
+
+        results = []
+        for name in args.engine or sorted(ENGINES):
+            print(f"Benchmarking {name}...")
+            for scenario, seconds in bench_engine(name, vault, root, args).items():
+                results.append(
+                    {
+                        "engine": name,
+                        "scenario": scenario,
+                        "seconds": seconds,
+                        "median": statistics.median(seconds),
+                        "min": min(seconds),
+                    }
+                )
+    finally:
+        if not args.keep:
+            if created_root:
+                shutil.rmtree(root, ignore_errors=True)
+            else:
+                for generated in (root / "vault", *root.glob("out-*-*")):
+                    shutil.rmtree(generated, ignore_errors=True)
+
+    report = {
+        "commit": git_revision(),
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "params": {
+            key: getattr(args, key)
+            for key in (
+                "posts",
+                "notes",
+                "note_kb",
+                "embeds",
+                "attachments",
+                "attachment_kb",
+                "jobs",
+                "repeat",
+                "stage_sample",
+                "seed",
+            )
+        },
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    baseline = None
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if baseline.get("params") != report["params"]:
+            print("Note: baseline was run with different parameters")
+
+    print_results(results, baseline)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
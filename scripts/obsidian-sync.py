@@ -6,199 +6,169 @@ with image processing and path resolution.
 """
 
 import os
-import re
-import shutil
 import argparse
 from pathlib import Path
-from datetime import datetime
-import yaml
-import subprocess
 
-
-class ObsidianHugoSync:
-    def __init__(self, obsidian_vault_path, hugo_content_path, hugo_static_path):
+from obsidian_hugo import (
+    COMMIT_MODES,
+    TRANSFER_MODES,
+    FrontMatterStage,
+    PostClassifier,
+    SyncEngine,
+    SyncProfiler,
+    VaultWalker,
+    create_image_store,
+    file_date,
+    has_front_matter,
+    parse_widths,
+)
+
+
+class ObsidianHugoSync(SyncEngine):
+    def __init__(
+        self,
+        obsidian_vault_path,
+        hugo_content_path,
+        hugo_static_path,
+        manifest_path=None,
+        classify_cache_path=None,
+        commit_window=0.0,
+        image_store=None,
+        profiler=None,
+        link_index_path=None,
+        walk_cache_path=None,
+        ignore=(),
+        stage_cache_path=None,
+        commit_mode="index",
+    ):
         self.obsidian_vault = Path(obsidian_vault_path)
-        self.hugo_content = Path(hugo_content_path)
-        self.hugo_static = Path(hugo_static_path)
-        self.hugo_images = self.hugo_static / "images"
-
-        # Ensure directories exist
-        self.hugo_content.mkdir(parents=True, exist_ok=True)
-        self.hugo_images.mkdir(parents=True, exist_ok=True)
+        self.classifier = PostClassifier(classify_cache_path)
+        self.walker = VaultWalker(
+            self.obsidian_vault, ignore=ignore, cache_path=walk_cache_path
+        )
+        self.front_matter = FrontMatterStage(
+            {
+                "draft": False,
+                "author": "amlucas0xff",
+                "categories": ["general"],
+                "tags": [],
+            },
+            self.post_date,
+        )
+        super().__init__(
+            self.obsidian_vault,
+            hugo_content_path,
+            hugo_static_path,
+            manifest_path=manifest_path,
+            commit_window=commit_window,
+            image_store=image_store,
+            profiler=profiler,
+            link_index_path=link_index_path,
+            stage_cache_path=stage_cache_path,
+            commit_mode=commit_mode,
+        )
+
+    def pipeline_stages(self):
+        # Images, links, then front matter
+        return [*super().pipeline_stages(), self.front_matter]
 
     def find_blog_posts(self):
         """Find all markdown files in the Obsidian vault that should be blog posts."""
         blog_posts = []
-
-        # Look for files with blog-related tags or in blog folder
-        for md_file in self.obsidian_vault.rglob("*.md"):
-            if self.is_blog_post(md_file):
-                blog_posts.append(md_file)
-
-        return blog_posts
+        md_files = []
+
+        # Look for files with blog-related tags or in blog folder; notes are
+        # classified as the walker finds them
+        for md_file in self.profiler.iterate("scan", self.walker.walk()):
+            md_files.append(md_file)
+            with self.profiler.stage("classify") as rec:
+                bytes_before = self.classifier.stats["bytes"]
+                if self.is_blog_post(md_file):
+                    blog_posts.append(md_file)
+                if rec:
+                    rec.files = 1
+                    rec.bytes_read = self.classifier.stats["bytes"] - bytes_before
+
+        self.classifier.retain(md_files)
+        return sorted(blog_posts)
 
     def is_blog_post(self, file_path):
-        """Determine if a markdown file should be treated as a blog post."""
-        try:
-            content = file_path.read_text(encoding="utf-8")
-
-            # Check for Hugo front matter
-            if content.startswith("---") or content.startswith("+++"):
-                return True
-
-            # Check for blog-related tags
-            if re.search(r"#blog|#post|#publish", content, re.IGNORECASE):
-                return True
-
-            # Check if in blog folder
-            if "blog" in str(file_path).lower():
-                return True
+        """Determine if a markdown file should be treated as a blog post.
 
+        Blog folder paths and front matter are detected without reading the
+        whole note; only notes that need a tag scan are read in full.
+        """
+        try:
+            return self.classifier.is_blog_post(file_path)
         except Exception as e:
             print(f"Error reading {file_path}: {e}")
 
         return False
 
-    def process_images(self, content, source_file):
-        """Process and copy images, updating markdown links."""
-        source_dir = source_file.parent
-
-        # Pattern to match markdown images: ![alt](path) or ![[path]]
-        image_patterns = [
-            r"!\[([^\]]*)\]\(([^)]+)\)",  # ![alt](path)
-            r"!\[\[([^\]]+)\]\]",  # ![[path]]
-        ]
-
-        processed_content = content
-
-        for pattern in image_patterns:
-            matches = re.finditer(pattern, content)
-            for match in matches:
-                if pattern.endswith(r"\]\]"):  # Obsidian style ![[image]]
-                    image_path = match.group(1)
-                    alt_text = Path(image_path).stem
-                else:  # Standard markdown ![alt](path)
-                    alt_text = match.group(1)
-                    image_path = match.group(2)
-
-                # Skip if it's already a web URL
-                if image_path.startswith(("http://", "https://")):
-                    continue
-
-                # Resolve image path
-                if os.path.isabs(image_path):
-                    source_image = Path(image_path)
-                else:
-                    source_image = source_dir / image_path
-
-                if source_image.exists():
-                    # Copy image to Hugo static/images
-                    image_name = f"{source_file.stem}_{source_image.name}"
-                    dest_image = self.hugo_images / image_name
-
-                    shutil.copy2(source_image, dest_image)
-
-                    # Update content with new path
-                    hugo_image_path = f"/images/{image_name}"
-                    new_markdown = f"![{alt_text}]({hugo_image_path})"
-
-                    processed_content = processed_content.replace(
-                        match.group(0), new_markdown
-                    )
-                    print(f"Copied image: {source_image} -> {dest_image}")
-
-        return processed_content
-
-    def process_front_matter(self, content, source_file):
-        """Process and ensure proper Hugo front matter."""
-        lines = content.split("\n")
-
+    def is_post(self, path):
+        return self.is_blog_post(path)
+
+    def resolve_image(self, image_path, source_file):
+        """Return the file an embed points to, or None to leave it alone."""
+        # Resolve image path: absolute paths as-is, everything else
+        # through the vault attachment index
+        if os.path.isabs(image_path):
+            source_image = Path(image_path)
+            return source_image if source_image.exists() else None
+
+        return super().resolve_image(image_path, source_file)
+
+    def post_date(self, source_file):
+        """Default date for a post: when it was first synced, else file metadata."""
+        if self.manifest is not None:
+            first_seen = self.manifest.first_seen(source_file)
+            if first_seen:
+                return first_seen
+        return file_date(source_file)
+
+    def process_front_matter(self, content, source_file, date=None):
+        """Process and ensure proper Hugo front matter.
+
+        Existing front matter is passed through byte for byte; generated front
+        matter only depends on the note, so unchanged notes give identical output.
+        """
         # Check if front matter exists
-        if not content.startswith(("---", "+++")):
-            # Create new front matter
-            front_matter = {
-                "title": source_file.stem.replace("-", " ").replace("_", " ").title(),
-                "date": datetime.now().isoformat(),
-                "draft": False,
-                "author": "amlucas0xff",
-                "categories": ["general"],
-                "tags": [],
-            }
-
-            yaml_front_matter = (
-                "---\n" + yaml.dump(front_matter, default_flow_style=False) + "---\n\n"
-            )
-            return yaml_front_matter + content
+        if not has_front_matter(content):
+            date = date or self.post_date(source_file)
+            return self.front_matter.render(content, source_file, date)
 
         return content
 
-    def sync_post(self, source_file):
-        """Sync a single blog post from Obsidian to Hugo."""
-        try:
-            content = source_file.read_text(encoding="utf-8")
-
-            # Process images
-            content = self.process_images(content, source_file)
-
-            # Process front matter
-            content = self.process_front_matter(content, source_file)
-
-            # Determine destination
-            dest_file = self.hugo_content / "posts" / source_file.name
-            dest_file.parent.mkdir(parents=True, exist_ok=True)
-
-            # Write processed content
-            dest_file.write_text(content, encoding="utf-8")
-
-            print(f"Synced: {source_file} -> {dest_file}")
-            return dest_file
-
-        except Exception as e:
-            print(f"Error syncing {source_file}: {e}")
-            return None
-
-    def sync_all(self):
-        """Sync all blog posts from Obsidian to Hugo."""
-        blog_posts = self.find_blog_posts()
-        synced_files = []
+    def link_slug(self, source_file):
+        """Hugo relref path of the page a note is published as."""
+        return f"/posts/{source_file.name}"
 
-        print(f"Found {len(blog_posts)} blog posts to sync")
+    def output_path(self, source_file):
+        """Where a note is published."""
+        return self.hugo_content / "posts" / source_file.name
 
-        for post in blog_posts:
-            result = self.sync_post(post)
-            if result:
-                synced_files.append(result)
+    def save_state(self):
+        """Finish background image work, then save the manifest and vault caches."""
+        super().save_state()
+        self.classifier.save()
+        self.walker.save()
 
-        return synced_files
+    def commit_message(self, file_names):
+        """Build the auto-commit message for a batch of synced posts."""
+        commit_msg = super().commit_message(file_names)
+        commit_msg += "\n\n🤖 Generated with [Claude Code](https://claude.ai/code)\n\nCo-Authored-By: Claude <noreply@anthropic.com>"
+        return commit_msg
 
     def auto_commit(self, synced_files):
-        """Automatically commit synced files to git."""
-        if not synced_files:
-            print("No files to commit")
-            return
-
-        try:
-            # Add files to git
-            subprocess.run(["git", "add", "."], cwd=Path.cwd(), check=True)
-
-            # Create commit message
-            file_names = [f.name for f in synced_files]
-            if len(file_names) == 1:
-                commit_msg = f"Sync blog post: {file_names[0]}"
-            else:
-                commit_msg = f"Sync {len(file_names)} blog posts from Obsidian"
-
-            commit_msg += "\n\n🤖 Generated with [Claude Code](https://claude.ai/code)\n\nCo-Authored-By: Claude <noreply@anthropic.com>"
+        """Automatically commit synced files to git.
 
-            # Commit
-            subprocess.run(
-                ["git", "commit", "-m", commit_msg], cwd=Path.cwd(), check=True
-            )
-
-            print(f"Auto-committed {len(synced_files)} files")
-
-        except subprocess.CalledProcessError as e:
-            print(f"Git commit failed: {e}")
+        Only the posts and images written by this sync, and the posts and
+        images it removed, are staged. With a commit window, rapid calls are grouped
+        into a single commit.
+        """
+        paths = self.commit_changes(synced_files)
+        if paths:
+            print(f"Auto-committed {len(paths)} files")
 
 
 def main():
@@ -217,7 +187,102 @@ def main():
     parser.add_argument(
         "--auto-commit", action="store_true", help="Automatically commit changes to git"
     )
+    parser.add_argument(
+        "--commit-mode",
+        choices=COMMIT_MODES,
+        default="index",
+        help="index stages files and runs git commit (with hooks); tree builds "
+        "the commit with git plumbing, without scanning the index",
+    )
     parser.add_argument("--single-file", help="Sync only a specific file")
+    parser.add_argument(
+        "--manifest",
+        default="./.obsidian-sync/manifest.json",
+        help="Path to the incremental sync manifest",
+    )
+    parser.add_argument(
+        "--ignore",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="Skip vault files and folders matching this glob (repeatable)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of posts to sync in parallel",
+    )
+    parser.add_argument(
+        "--async-io",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Overlap post reads, image copies and writes, N of each at a time",
+    )
+    parser.add_argument(
+        "--async-window",
+        type=int,
+        metavar="N",
+        help="With --async-io, the most posts in flight at once (default: 4x N)",
+    )
+    parser.add_argument(
+        "--optimize-images",
+        action="store_true",
+        help="Publish images as resized WebP variants (requires Pillow)",
+    )
+    parser.add_argument(
+        "--image-widths",
+        type=parse_widths,
+        default=[480, 960, 1600],
+        help="Comma-separated widths for optimized images",
+    )
+    parser.add_argument(
+        "--image-quality",
+        type=int,
+        default=80,
+        help="WebP quality for optimized images",
+    )
+    parser.add_argument(
+        "--image-transfer",
+        choices=sorted(TRANSFER_MODES),
+        default="auto",
+        help="How new images are copied: auto tries reflink, copy_file_range "
+        "and sendfile before a plain copy; hardlink tries a hard link first",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Ignore the manifest and re-sync every post",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="./.obsidian-sync/profile.json",
+        metavar="PATH",
+        help="Record per-stage timings and I/O and write a JSON report",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        help="Number of slowest posts to list with --profile",
+    )
+    parser.add_argument(
+        "--gc",
+        action="store_true",
+        help="Delete images that synced posts stopped embedding",
+    )
+    parser.add_argument(
+        "--gc-all",
+        action="store_true",
+        help="Check every sync-published image in static/images (implies --gc)",
+    )
+    parser.add_argument(
+        "--gc-dry-run",
+        action="store_true",
+        help="List the images --gc would delete without deleting them",
+    )
 
     args = parser.parse_args()
 
@@ -225,17 +290,48 @@ def main():
         obsidian_vault_path=args.obsidian_vault,
         hugo_content_path=args.hugo_content,
         hugo_static_path=args.hugo_static,
+        manifest_path=args.manifest,
+        link_index_path=Path(args.manifest).with_name("links.json"),
+        walk_cache_path=Path(args.manifest).with_name("walk-cache.json"),
+        stage_cache_path=Path(args.manifest).with_name("stage-cache"),
+        ignore=args.ignore,
+        classify_cache_path=Path(args.manifest).with_name("classify-cache.json"),
+        image_store=create_image_store(
+            Path(args.hugo_static) / "images",
+            optimize=args.optimize_images,
+            widths=args.image_widths,
+            quality=args.image_quality,
+            transfer=args.image_transfer,
+        ),
+        profiler=SyncProfiler() if args.profile else None,
+        commit_mode=args.commit_mode,
     )
 
     if args.single_file:
         source_file = Path(args.single_file)
         if source_file.exists():
+            sync.profiler.start()
             synced = [sync.sync_post(source_file)]
+            sync.save_state()
+            sync.profiler.finish()
         else:
             print(f"File not found: {args.single_file}")
             return
     else:
-        synced = sync.sync_all()
+        synced = sync.sync_all(
+            full=args.full,
+            jobs=args.jobs,
+            async_io=args.async_io,
+            window=args.async_window,
+        )
+
+    if args.profile:
+        sync.profiler.write(args.profile)
+        sync.profiler.print_summary(args.profile_top)
+        print(f"Profile written to {args.profile}")
+
+    if args.gc or args.gc_all or args.gc_dry_run:
+        sync.collect_images(dry_run=args.gc_dry_run, sweep=args.gc_all)
 
     if args.auto_commit:
         sync.auto_commit([f for f in synced if f])
@@ -0,0 +1,88 @@
+"""
+Shared building blocks for the Obsidian to Hugo sync scripts.
+Imported by obsidian-sync.py, sync-obsidian-blog.py and watch-obsidian.py.
+"""
+
+from .aio import run_pipelined
+from .attachments import IGNORED_DIRS, AttachmentIndex
+from .classify import PostClassifier
+from .embeds import rewrite_embeds
+from .engine import SyncEngine
+from .events import CoalescingQueue, QueueingEventHandler
+from .frontmatter import (
+    dump_front_matter,
+    file_date,
+    has_front_matter,
+    load_front_matter,
+)
+from .gitops import COMMIT_MODES, GitPublisher
+from .image_gc import ImageCollector
+from .image_store import ImageStore
+from .journal import JobJournal
+from .loader import load_sync_engine
+from .links import LinkIndex, link_targets, rewrite_wikilinks
+from .manifest import SyncManifest, file_digest, read_source
+from .metrics import Metrics, MetricsProfiler, serve_metrics
+from .optimize import OptimizingImageStore, create_image_store, parse_widths
+from .output import OutputWriter
+from .parallel import log, map_posts
+from .pipeline import (
+    EmbedStage,
+    FrontMatterStage,
+    LinkStage,
+    Note,
+    Pipeline,
+    Stage,
+    StageCache,
+)
+from .profiler import NullProfiler, SyncProfiler
+from .transfer import TRANSFER_MODES, FileTransfer
+from .walker import VaultWalker
+
+__all__ = [
+    "COMMIT_MODES",
+    "IGNORED_DIRS",
+    "TRANSFER_MODES",
+    "AttachmentIndex",
+    "CoalescingQueue",
+    "EmbedStage",
+    "FileTransfer",
+    "FrontMatterStage",
+    "GitPublisher",
+    "ImageCollector",
+    "ImageStore",
+    "JobJournal",
+    "LinkIndex",
+    "LinkStage",
+    "Metrics",
+    "MetricsProfiler",
+    "Note",
+    "NullProfiler",
+    "OptimizingImageStore",
+    "OutputWriter",
+    "Pipeline",
+    "PostClassifier",
+    "QueueingEventHandler",
+    "Stage",
+    "StageCache",
+    "SyncEngine",
+    "SyncManifest",
+    "SyncProfiler",
+    "VaultWalker",
+    "create_image_store",
+    "dump_front_matter",
+    "file_date",
+    "file_digest",
+    "has_front_matter",
+    "link_targets",
+    "load_front_matter",
+    "load_sync_engine",
+    "log",
+    "map_posts",
+    "parse_widths",
+    "read_source",
+    "run_pipelined",
+    "rewrite_embeds",
+    "rewrite_wikilinks",
+    "serve_metrics",
+]
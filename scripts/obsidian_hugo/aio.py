@@ -0,0 +1,70 @@
+"""
+Asyncio runner that overlaps the disk I/O of different posts.
+Each post goes read -> render -> write. The phases run on worker threads, each
+under its own concurrency limit, and at most `window` posts are in flight at
+once, so memory stays flat however large the vault is. Results and console
+messages come out in input order, exactly as a serial run prints them.
+"""
+
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .parallel import call_buffered, print_message
+
+
+def run_pipelined(posts, read, render, write, limit=8, window=None):
+    """Sync posts with overlapped I/O; returns [(post, result)] in input order.
+
+    read(post), render(post, data) and write(post, data) are the phases; a
+    phase returning None ends that post (it is expected to report its own
+    error). Up to limit reads, renders and writes run concurrently.
+    """
+    window = window or 4 * limit
+    return asyncio.run(_run(list(posts), (read, render, write), limit, window))
+
+
+async def _run(posts, phases, limit, window):
+    loop = asyncio.get_running_loop()
+    slots = [asyncio.Semaphore(limit) for _ in phases]
+    in_flight = asyncio.Semaphore(window)
+    results = []
+
+    with ThreadPoolExecutor(max_workers=limit * len(phases)) as executor:
+
+        async def sync_one(post):
+            messages = []
+            try:
+                data = None
+                for index, (phase, slot) in enumerate(zip(phases, slots)):
+                    args = (post,) if index == 0 else (post, data)
+                    async with slot:
+                        data = await loop.run_in_executor(
+                            executor, call_buffered, messages, phase, *args
+                        )
+                    if data is None:
+                        break
+                return data, messages
+            finally:
+                in_flight.release()
+
+        pending = deque()
+
+        def emit(post, result, messages):
+            for message in messages:
+                print_message(message)
+            results.append((post, result))
+
+        for post in posts:
+            # Backpressure: wait for a free slot before reading another post
+            await in_flight.acquire()
+            pending.append((post, asyncio.ensure_future(sync_one(post))))
+            while pending and pending[0][1].done():
+                done_post, task = pending.popleft()
+                emit(done_post, *task.result())
+
+        while pending:
+            done_post, task = pending.popleft()
+            emit(done_post, *await task)
+
+    return results
@@ -0,0 +1,113 @@
+"""
+In-memory index of every attachment in the vault.
+Built with a single directory walk and kept current from filesystem events, so
+resolving an embed is a dictionary lookup with no stat calls. Resolution
+follows Obsidian: a path relative to the note, then a vault-relative path,
+then the shortest unique path match on the file name.
+"""
+
+import os
+import posixpath
+from pathlib import Path
+from urllib.parse import unquote
+
+IGNORED_DIRS = {".obsidian", ".trash", ".git"}
+
+
+def clean_target(target):
+    """Drop Obsidian display/size suffixes and anchors, undo %20 escapes."""
+    return unquote(target.split("|", 1)[0].split("#", 1)[0]).strip()
+
+
+class AttachmentIndex:
+    """Maps attachment names and vault-relative paths to files in the vault."""
+
+    def __init__(self, vault_root, ignored_dirs=IGNORED_DIRS):
+        self.vault_root = Path(vault_root)
+        self.ignored_dirs = set(ignored_dirs)
+        self._root = os.path.abspath(self.vault_root)
+        self.by_name = {}  # lowercase file name -> set of vault-relative paths
+        self.by_path = {}  # lowercase vault-relative path -> vault-relative path
+        self.build()
+
+    def build(self):
+        """(Re)build the index with one walk over the vault."""
+        self.by_name.clear()
+        self.by_path.clear()
+
+        stack = [str(self.vault_root)]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in self.ignored_dirs:
+                            stack.append(entry.path)
+                    elif not entry.name.endswith(".md"):
+                        self._insert(self._relative(entry.path))
+
+    def _relative(self, path):
+        relative = os.path.relpath(os.path.abspath(path), self._root)
+        return relative.replace(os.sep, "/")
+
+    def _insert(self, relative):
+        self.by_path[relative.lower()] = relative
+        name = posixpath.basename(relative).lower()
+        self.by_name.setdefault(name, set()).add(relative)
+
+    def _discard(self, relative):
+        if self.by_path.pop(relative.lower(), None) is None:
+            return
+        name = posixpath.basename(relative).lower()
+        paths = self.by_name.get(name)
+        if paths is not None:
+            paths.discard(relative)
+            if not paths:
+                del self.by_name[name]
+
+    def refresh(self, path):
+        """Update the index for one changed path (created, modified or deleted)."""
+        relative = self._relative(path)
+        if relative.startswith("..") or relative.endswith(".md"):
+            return
+        if any(part in self.ignored_dirs for part in relative.split("/")):
+            return
+
+        if os.path.isfile(path):
+            self._insert(relative)
+        else:
+            self._discard(relative)
+
+    def resolve(self, target, source_file):
+        """Return the vault file an embed in source_file points to, or None."""
+        target = clean_target(target)
+        if not target:
+            return None
+
+        note_dir = self._relative(Path(source_file).parent)
+
+        # Relative to the note, then relative to the vault root
+        for candidate in (posixpath.join(note_dir, target), target.lstrip("/")):
+            relative = self.by_path.get(posixpath.normpath(candidate).lower())
+            if relative is not None:
+                return self.vault_root / relative
+
+        # Shortest-path links: match on the name, then on the path suffix
+        candidates = self.by_name.get(posixpath.basename(target).lower())
+        if not candidates:
+            return None
+
+        if "/" in target:
+            suffix = "/" + target.lower()
+            candidates = [p for p in candidates if ("/" + p.lower()).endswith(suffix)]
+            if not candidates:
+                return None
+
+        if len(candidates) > 1:
+            same_folder = [p for p in candidates if posixpath.dirname(p) == note_dir]
+            candidates = same_folder or candidates
+
+        return self.vault_root / min(candidates, key=lambda p: (p.count("/"), p))
@@ -0,0 +1,84 @@
+"""
+Blog post classification for vault notes.
+Answers from the path or the first bytes of a note whenever possible, only
+reads whole files that need a tag scan, and caches verdicts by
+(inode, mtime, size) so an unchanged vault is classified without opening files.
+"""
+
+import os
+import re
+from pathlib import Path
+
+from .state import load_state, save_state
+
+FRONT_MATTER_MARKERS = (b"---", b"+++")
+TAG_PATTERN = re.compile(rb"#blog|#post|#publish", re.IGNORECASE)
+
+
+class PostClassifier:
+    """Decides whether a markdown file should be treated as a blog post."""
+
+    VERSION = 1
+
+    def __init__(self, cache_path=None):
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.cache = {}  # path -> [inode, mtime_ns, size, verdict]
+        self.dirty = False
+        self.stats = {"path": 0, "cached": 0, "header": 0, "scanned": 0, "bytes": 0}
+        self.load()
+
+    def load(self):
+        if self.cache_path is None:
+            return
+        data = load_state(self.cache_path, self.VERSION)
+        if data is not None:
+            self.cache = data.get("verdicts", {})
+
+    def save(self):
+        if self.cache_path is None or not self.dirty:
+            return
+        save_state(self.cache_path, self.VERSION, {"verdicts": self.cache})
+        self.dirty = False
+
+    def is_blog_post(self, file_path):
+        """Classify a note, reading as little of it as possible."""
+        # Anything under a blog folder is a post - no I/O needed
+        if "blog" in str(file_path).lower():
+            self.stats["path"] += 1
+            return True
+
+        key = str(file_path)
+        st = os.stat(file_path)
+        fingerprint = [st.st_ino, st.st_mtime_ns, st.st_size]
+        cached = self.cache.get(key)
+        if cached is not None and cached[:3] == fingerprint:
+            self.stats["cached"] += 1
+            return cached[3]
+
+        verdict = self._classify(file_path)
+        self.cache[key] = fingerprint + [verdict]
+        self.dirty = True
+        return verdict
+
+    def _classify(self, file_path):
+        with open(file_path, "rb") as handle:
+            # Hugo front matter is decided by the first three bytes
+            header = handle.read(3)
+            self.stats["bytes"] += len(header)
+            if header in FRONT_MATTER_MARKERS:
+                self.stats["header"] += 1
+                return True
+
+            # Only notes without front matter need a full tag scan
+            self.stats["scanned"] += 1
+            content = header + handle.read()
+            self.stats["bytes"] += len(content) - len(header)
+
+        return TAG_PATTERN.search(content) is not None
+
+    def retain(self, file_paths):
+        """Drop cached verdicts for notes that are no longer in the vault."""
+        keep = {str(path) for path in file_paths}
+        for key in [key for key in self.cache if key not in keep]:
+            del self.cache[key]
+            self.dirty = True
@@ -0,0 +1,41 @@
+"""
+Single-pass rewriting of image embeds in a note.
+Finds both ![alt](path) and Obsidian ![[path]] embeds with one compiled
+pattern, resolves each distinct target once and rebuilds the text in one
+substitution pass.
+"""
+
+import re
+from pathlib import Path
+
+# Group 1: Obsidian ![[path]]; groups 2/3: standard ![alt](path)
+EMBED_PATTERN = re.compile(r"!\[\[([^\]]+)\]\]|!\[([^\]]*)\]\(([^)]+)\)")
+
+
+def rewrite_embeds(content, resolve):
+    """Rewrite image embeds to Hugo-style ![alt](url) links.
+
+    resolve(target) returns the published URL for a target, an object whose
+    render(alt_text) returns the replacement text, or None to leave the embed
+    untouched. It is called once per distinct target.
+    """
+    resolved = {}
+
+    def substitute(match):
+        if match.group(1) is not None:
+            target = match.group(1)
+            alt_text = Path(target).stem
+        else:
+            alt_text, target = match.group(2), match.group(3)
+
+        if target not in resolved:
+            resolved[target] = resolve(target)
+
+        link = resolved[target]
+        if link is None:
+            return match.group(0)
+        if isinstance(link, str):
+            return f"![{alt_text}]({link})"
+        return link.render(alt_text)
+
+    return EMBED_PATTERN.sub(substitute, content)
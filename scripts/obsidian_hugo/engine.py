@@ -0,0 +1,609 @@
+"""
+The sync engine both Obsidian to Hugo scripts are built on.
+SyncEngine owns the pipeline, manifest, link graph, image store and git
+publisher and knows how to sync, move and unpublish posts. A script
+subclasses it for its layout - where posts are found and published, how
+they are linked and how embeds resolve - and for the wording of its output.
+"""
+
+import os
+from pathlib import Path
+
+from .aio import run_pipelined
+from .attachments import AttachmentIndex
+from .embeds import rewrite_embeds
+from .gitops import GitPublisher
+from .image_gc import ImageCollector
+from .image_store import ImageStore
+from .links import LinkIndex
+from .manifest import SyncManifest, read_source
+from .output import OutputWriter
+from .parallel import log, log_once, map_posts
+from .pipeline import EmbedStage, LinkStage, Note, Pipeline, StageCache
+from .profiler import NullProfiler
+
+
+class SyncEngine:
+    """Publishes vault notes as Hugo posts; subclasses supply the layout.
+
+    Subclasses implement find_blog_posts, is_post, output_path and link_slug,
+    and may override resolve_image, post_path and messages. With bundles set,
+    each post is published as its own page bundle directory.
+    """
+
+    bundles = False
+
+    # Output templates, filled in with str.format
+    messages = {
+        "found": "Found {count} blog posts to sync",
+        "keeping": "No posts found under {root}; keeping {count} published posts",
+        "synced": "Synced: {source} -> {dest}",
+        "failed": "Error syncing {source}: {error}",
+        "copied": "Copied image: {image} ({strategy})",
+        "renamed": "Renamed: {old} -> {new}",
+        "rename_failed": "Could not rename {old}: {error}",
+        "removed": "Removed: {path}",
+        "skipped": "Skipped {count} unchanged posts",
+        "avoided": "Avoided {count} writes of identical posts and images",
+        "transfers": "Image transfers: {summary}",
+        "errors": "{count} posts failed to sync:",
+        "error": "  {post}: {error}",
+        "gc_needs_manifest": "Image cleanup needs a manifest",
+        "gc_dry_run": "Would remove {count} unreferenced images",
+        "gc_path": "  {path}",
+        "gc_removed": "Removed {count} unreferenced images",
+        "nothing_to_commit": "No files to commit",
+    }
+
+    def __init__(
+        self,
+        vault_root,
+        hugo_content_path,
+        hugo_static_path,
+        manifest_path=None,
+        commit_window=0.0,
+        image_store=None,
+        profiler=None,
+        link_index_path=None,
+        stage_cache_path=None,
+        commit_mode="index",
+        push=False,
+    ):
+        self.hugo_content = Path(hugo_content_path)
+        self.hugo_static = Path(hugo_static_path)
+        self.hugo_images = self.hugo_static / "images"
+        self.manifest = SyncManifest(manifest_path) if manifest_path else None
+        self.image_store = image_store or ImageStore(self.hugo_images)
+        self.attachments = AttachmentIndex(vault_root)
+        self.profiler = profiler or NullProfiler()
+        self.writer = OutputWriter()
+        # Links only resolve to notes with a recorded output, so a post that
+        # fails to render is never the target of a relref Hugo cannot find.
+        # Notes first written during a pass become linkable after it, in
+        # take_stale_links(), so parallel runs render the same links
+        self.new_outputs = set()
+        self.links = LinkIndex(
+            link_index_path,
+            published=self.linkable if self.manifest is not None else None,
+        )
+        self.stale_links = set()  # notes whose [[links]] resolve differently now
+        self.announced = set()  # images whose copy was logged
+        self.pipeline = Pipeline(
+            self.pipeline_stages(),
+            cache=StageCache(stage_cache_path) if stage_cache_path else None,
+            profiler=self.profiler,
+        )
+        self.errors = {}
+        self.outputs = {}  # synced post -> images it references, for git staging
+        self.removed_paths = []  # deleted posts and images, staged with the next commit
+        self.publisher = GitPublisher(
+            describe=self.commit_message,
+            push=push,
+            window=commit_window,
+            mode=commit_mode,
+        )
+
+        # Ensure directories exist
+        self.hugo_content.mkdir(parents=True, exist_ok=True)
+        self.hugo_images.mkdir(parents=True, exist_ok=True)
+
+    def message(self, name, **fields):
+        return self.messages[name].format(**fields)
+
+    def find_blog_posts(self):
+        """Return the sorted paths of every note to publish."""
+        raise NotImplementedError
+
+    def is_post(self, path):
+        """Whether a vault note is (or would be) published."""
+        raise NotImplementedError
+
+    def source_root(self):
+        """The folder every post lives under."""
+        return self.attachments.vault_root
+
+    def post_path(self, path):
+        """The path a post is tracked under, for a path reported by the watcher.
+
+        Watch events report absolute paths, while posts are tracked under
+        source_root as configured. Returns None for paths outside it.
+        """
+        root = self.source_root()
+        relative = os.path.relpath(os.path.abspath(path), os.path.abspath(root))
+        if relative.startswith(os.pardir):
+            return None
+        return root / relative
+
+    def output_path(self, source_file):
+        """Where a post is published."""
+        raise NotImplementedError
+
+    def link_slug(self, source_file):
+        """Hugo relref path of the page a post is published as."""
+        raise NotImplementedError
+
+    def resolve_image(self, image_path, source_file):
+        """Return the file an embed points to, or None to leave it alone."""
+        # Skip if it's already a web URL
+        if image_path.startswith(("http://", "https://")):
+            return None
+
+        with self.profiler.stage("image_resolve", source_file):
+            return self.attachments.resolve(image_path, source_file)
+
+    def pipeline_stages(self):
+        """The transforms every post goes through, in order."""
+        return [
+            EmbedStage(
+                self.process_images,
+                self.resolve_image,
+                getattr(self.image_store, "settings_key", None),
+            ),
+            LinkStage(self.links, self.link_slug, self.stale_links.update),
+        ]
+
+    def published_path(self, output):
+        """What publishing a post created: its bundle directory, or the file."""
+        return output.parent if self.bundles else output
+
+    def post_name(self, output):
+        """How a published post is named in commit messages."""
+        return self.published_path(output).name
+
+    def process_images(self, content, source_file, emitted_images=None, resolved=None):
+        """Process and copy images, updating markdown links.
+
+        Copied images are appended to emitted_images as (source, dest) pairs;
+        resolved, if given, maps each embed target to the file it resolved to.
+        """
+
+        def resolve(image_path):
+            source_image = self.resolve_image(image_path, source_file)
+            if resolved is not None:
+                resolved[image_path] = source_image
+            if source_image is None:
+                return None
+
+            # Store the image under its content hash; identical bytes are
+            # copied once and keep the same link across runs
+            with self.profiler.stage("image_copy", source_file) as rec:
+                link, dest_images, copied = self.image_store.publish_embed(
+                    source_image
+                )
+                if rec and copied:
+                    rec.files = len(dest_images)
+                    rec.bytes_read = source_image.stat().st_size
+                    rec.bytes_written = sum(d.stat().st_size for d in dest_images)
+            if emitted_images is not None:
+                emitted_images.extend((source_image, dest) for dest in dest_images)
+
+            return link
+
+        return rewrite_embeds(content, resolve)
+
+    def linkable(self, source):
+        """Whether links may point at a note: it was written before this pass."""
+        return source not in self.new_outputs and self.manifest.get(source) is not None
+
+    def take_stale_links(self):
+        """Return (and forget) the notes that need re-rendering for links.
+
+        Notes first written since the last call become linkable now, so the
+        notes linking to them are among those returned.
+        """
+        for source in list(self.new_outputs):
+            self.stale_links.update(self.links.mark_published(source))
+        self.new_outputs.clear()
+        stale = set(self.stale_links)
+        self.stale_links.clear()
+        return sorted(post for post in stale if post.exists())
+
+    def sync_post(self, source_file):
+        """Sync a single blog post from Obsidian to Hugo."""
+        source = self.read_post(source_file)
+        rendered = source and self.render_post(source_file, source)
+        return rendered and self.write_post(source_file, rendered)
+
+    def sync_failed(self, source_file, error):
+        self.errors[source_file] = error
+        log(self.message("failed", source=source_file, error=error))
+
+    def read_post(self, source_file):
+        """Read a note; returns (content, source_hash) or None on failure."""
+        try:
+            with self.profiler.stage("read", source_file) as rec:
+                content, source_hash = read_source(source_file)
+                if rec:
+                    rec.files = 1
+                    rec.bytes_read = source_file.stat().st_size
+            return content, source_hash
+        except Exception as e:
+            self.sync_failed(source_file, e)
+            return None
+
+    def render_post(self, source_file, source):
+        """Turn a note into Hugo content, publishing the images it embeds."""
+        content, source_hash = source
+        try:
+            note = Note(source_file, content)
+            content = self.pipeline.run(note)
+            self.log_copies(note)
+            return note, content, source_hash
+        except Exception as e:
+            self.sync_failed(source_file, e)
+            return None
+
+    def log_copies(self, note):
+        """Log the images this run copied for a note's embeds.
+
+        Workers race to copy a shared image, and a memoized note finds it
+        already copied, so each copy is logged once, under the first post
+        in input order that embeds it - as a serial run would.
+        """
+        for source_image, dest in note.images:
+            strategy = self.image_store.copies.get(dest.name)
+            if strategy:
+                message = self.message("copied", image=source_image, strategy=strategy)
+                log_once(self.announced, dest, message)
+
+    def write_post(self, source_file, rendered):
+        """Write rendered content and record it; returns the output path."""
+        note, content, source_hash = rendered
+        try:
+            emitted_images = note.images
+
+            dest_file = self.output_path(source_file)
+            dest_file.parent.mkdir(parents=True, exist_ok=True)
+            with self.profiler.stage("write", source_file) as rec:
+                written = self.writer.write_text(dest_file, content)
+                if rec and written:
+                    rec.files = 1
+                    rec.bytes_written = dest_file.stat().st_size
+
+            self.outputs[dest_file] = [dest for _, dest in emitted_images]
+            if self.manifest is not None:
+                first_output = self.manifest.get(source_file) is None
+                self.manifest.record(
+                    source_file,
+                    source_hash,
+                    dest_file,
+                    content,
+                    emitted_images,
+                    first_seen=note.first_seen,
+                    stages=note.stage_keys,
+                    pipeline=self.pipeline.key(),
+                    missing=note.missing,
+                )
+                if first_output:
+                    self.new_outputs.add(str(source_file))
+
+            log(self.message("synced", source=source_file, dest=dest_file))
+            return dest_file
+
+        except Exception as e:
+            self.sync_failed(source_file, e)
+            return None
+
+    def announce(self, blog_posts):
+        """Print what sync_all is about to do."""
+        print(self.message("found", count=len(blog_posts)))
+
+    def sync_all(self, full=False, jobs=1, async_io=0, window=None):
+        """Sync all blog posts from Obsidian to Hugo.
+
+        Unless full is set, posts the manifest reports as unchanged are skipped.
+        With jobs > 1 posts are synced on a thread pool; with async_io, reads,
+        image copies and writes of different posts overlap, async_io of each
+        at a time and at most window posts in flight. Either way results and
+        messages keep the serial order.
+        """
+        self.profiler.start()
+        writes_before = self.avoided_writes()
+        blog_posts = self.find_blog_posts()
+        synced_files = []
+        self.errors = {}
+
+        # Posts that left the vault or no longer qualify are unpublished
+        # before their images are released, so --gc never deletes an image
+        # a page that is still published links to
+        dropped = self.dropped_posts(blog_posts)
+        if dropped is None:
+            self.profiler.finish()
+            return synced_files
+        for source in dropped:
+            self.remove_post(source)
+        relink = self.links.register(self.published_posts(blog_posts), self.link_slug)
+        pipeline_key = self.pipeline.key()
+
+        self.announce(blog_posts)
+
+        pending = [
+            post
+            for post in blog_posts
+            if full
+            or post in relink
+            or self.manifest is None
+            or not self.manifest.is_fresh(post, pipeline_key, self.resolve_image)
+        ]
+        skipped = len(blog_posts) - len(pending)
+
+        for post, result in self.map_posts(pending, jobs, async_io, window):
+            if result:
+                synced_files.append(result)
+
+        # Aliases found during the pass can change where earlier posts link
+        relink = self.take_stale_links()
+        for post, result in self.map_posts(relink, jobs, async_io, window):
+            if result and result not in synced_files:
+                synced_files.append(result)
+
+        if skipped:
+            print(self.message("skipped", count=skipped))
+
+        avoided = self.avoided_writes() - writes_before
+        if avoided:
+            print(self.message("avoided", count=avoided))
+
+        transfers = self.image_store.transfer.summary()
+        if transfers:
+            print(self.message("transfers", summary=transfers))
+
+        if self.errors:
+            print(self.message("errors", count=len(self.errors)))
+            for post in pending:
+                if post in self.errors:
+                    print(self.message("error", post=post, error=self.errors[post]))
+
+        # Drop memoized stage outputs no tracked post can reuse any more
+        cache = self.pipeline.cache
+        if (pending or relink) and cache is not None and self.manifest is not None:
+            cache.prune(self.manifest.stage_keys())
+
+        self.save_state()
+        self.profiler.finish()
+        return synced_files
+
+    def _under_root(self, source):
+        root = os.path.join(os.path.abspath(self.source_root()), "")
+        return os.path.abspath(source).startswith(root)
+
+    def dropped_posts(self, blog_posts):
+        """Return the tracked notes to unpublish, or None to keep them all.
+
+        A note is dropped only when its source is gone from a posts folder
+        that exists, or still exists but is no longer a post. An unmounted
+        vault, or a walk that finds nothing while posts are published, keeps
+        everything: unpublishing would be committed and pushed.
+        """
+        if self.manifest is None or not self.manifest.entries:
+            return []
+        root = self.source_root()
+        if not root.is_dir() or not blog_posts:
+            print(self.message("keeping", root=root, count=len(self.manifest.entries)))
+            return None
+
+        return [
+            source
+            for source in self.manifest.dropped(blog_posts)
+            if (not source.exists() and self._under_root(source))
+            or (source.exists() and not self.is_post(source))
+        ]
+
+    def published_posts(self, blog_posts):
+        """blog_posts plus the tracked posts that stay published without them."""
+        if self.manifest is None:
+            return blog_posts
+        kept = [Path(source) for source in self.manifest.entries]
+        return sorted(set(blog_posts).union(kept))
+
+    def map_posts(self, posts, jobs=1, async_io=0, window=None):
+        """Yield (post, output path) for each post, in order."""
+        if not async_io:
+            return map_posts(self.sync_post, posts, jobs)
+
+        self.image_store.limit_copies(async_io)
+        try:
+            return run_pipelined(
+                posts,
+                self.read_post,
+                self.render_post,
+                self.write_post,
+                limit=async_io,
+                window=window,
+            )
+        finally:
+            self.image_store.limit_copies(None)
+
+    def move_post(self, old_path, new_path):
+        """Follow a renamed or moved note; returns its output path.
+
+        The published post is renamed and the manifest entry, link graph
+        entry and first-seen date move with it. Images are named by content,
+        so they stay put; the note is then synced through the memoized
+        pipeline, which only redoes what the new name changes.
+        """
+        old_path = self.post_path(old_path)
+        entry = None
+        if old_path is not None and self.manifest is not None:
+            entry = self.manifest.get(old_path)
+        new_path = self.post_path(new_path) if self.is_post(new_path) else None
+        if entry is None:
+            return self.sync_post(new_path) if new_path is not None else None
+        if new_path is None:
+            self.remove_post(old_path)
+            return None
+
+        old_output = Path(entry["output"])
+        new_output = self.output_path(new_path)
+        if old_output != new_output:
+            old_published = self.published_path(old_output)
+            new_published = self.published_path(new_output)
+            try:
+                if new_published.exists():
+                    # Another note already publishes under the new name
+                    old_output.unlink(missing_ok=True)
+                    self._remove_empty_bundle(old_output)
+                else:
+                    os.rename(old_published, new_published)
+                    log(self.message("renamed", old=old_published, new=new_published))
+                self.removed_paths.append(old_output)
+            except OSError as e:
+                log(self.message("rename_failed", old=old_published, error=e))
+
+        self.manifest.move(old_path, new_path, new_output)
+        self.links.move(old_path, new_path)
+        return self.sync_post(new_path)
+
+    def remove_post(self, source_file):
+        """Unpublish a deleted note; returns the removed output path, if any.
+
+        Its images are released for the next image collection, and notes
+        linking to it are marked for re-rendering.
+        """
+        source_file = self.post_path(source_file) or source_file
+        self.stale_links.update(self.links.forget(source_file))
+        entry = self.manifest.get(source_file) if self.manifest is not None else None
+        if entry is None:
+            return None
+
+        self.manifest.forget(source_file)
+        output = Path(entry["output"])
+        # Notes with the same name publish to the same file; keep theirs
+        if self.manifest.owner(output) is not None or not output.exists():
+            return None
+        output.unlink()
+        self._remove_empty_bundle(output)
+        self.removed_paths.append(output)
+        log(self.message("removed", path=self.published_path(output)))
+        return output
+
+    def remove_missing_posts(self):
+        """Unpublish tracked posts whose notes were deleted while not watching."""
+        removed = []
+        if self.manifest is not None and self.source_root().is_dir():
+            for source in list(self.manifest.entries):
+                if not os.path.exists(source) and self._under_root(source):
+                    output = self.remove_post(Path(source))
+                    if output:
+                        removed.append(output)
+        return removed
+
+    def _remove_empty_bundle(self, output):
+        if not self.bundles:
+            return
+        try:
+            output.parent.rmdir()
+        except OSError:
+            pass  # holds files the sync did not write
+
+    def posts_for_changes(self, changed_paths):
+        """Map changed vault files to the posts that need re-syncing."""
+        posts = set()
+        for path in changed_paths:
+            if path.suffix == ".md":
+                post = self.post_path(path)
+                if post is not None and post.exists():
+                    posts.add(post)
+            else:
+                # An attachment changed: re-sync the posts that embed it, or
+                # have an embed that found nothing under its name
+                self.attachments.refresh(path)
+                if self.manifest is not None:
+                    posts.update(
+                        post
+                        for post in [
+                            *self.manifest.dependents(path),
+                            *self.manifest.waiting_for(path),
+                        ]
+                        if post.exists()
+                    )
+
+        return sorted(posts)
+
+    def collect_images(self, dry_run=False, sweep=False):
+        """Delete (or list) published images no synced post embeds any more.
+
+        Only images released since the last collection are checked, unless
+        sweep is set. Needs the manifest, which records what each post embeds.
+        """
+        if self.manifest is None:
+            print(self.message("gc_needs_manifest"))
+            return []
+
+        collector = ImageCollector(self.hugo_images, self.manifest, self.hugo_content)
+        orphans = collector.collect(dry_run=dry_run, sweep=sweep)
+        if dry_run:
+            print(self.message("gc_dry_run", count=len(orphans)))
+            for path in orphans:
+                print(self.message("gc_path", path=path))
+        else:
+            self.removed_paths.extend(orphans)
+            self.announced.difference_update(orphans)  # a new copy is logged again
+            self.manifest.save()
+            if orphans:
+                print(self.message("gc_removed", count=len(orphans)))
+        return orphans
+
+    def avoided_writes(self):
+        """Number of post and image writes skipped because nothing changed."""
+        return self.writer.stats["unchanged"] + self.image_store.stats["reused"]
+
+    def save_state(self):
+        """Finish background image work, then persist the manifest and link graph."""
+        self.image_store.wait()
+        if self.manifest is not None:
+            self.manifest.save()
+        self.links.save()
+
+    def commit_message(self, post_names):
+        """Build the commit message for a batch of synced posts."""
+        if len(post_names) == 1:
+            return f"Sync blog post: {post_names[0]}"
+        return f"Sync {len(post_names)} blog posts from Obsidian"
+
+    def commit_changes(self, synced_files, message=None):
+        """Commit what syncs wrote and removed; returns the paths committed.
+
+        Only the posts and images written by this sync, and the posts and
+        images removed since the last commit, are staged. With a commit
+        window, calls within the window share one commit, made later.
+        """
+        paths, self.removed_paths = list(self.removed_paths), []
+        if not synced_files and not paths:
+            print(self.message("nothing_to_commit"))
+            return []
+
+        if not synced_files and message is None:
+            removed_posts = [self.post_name(p) for p in paths if p.suffix == ".md"]
+            if len(removed_posts) == 1:
+                message = f"Remove blog post: {removed_posts[0]}"
+            elif removed_posts:
+                message = f"Remove {len(removed_posts)} blog posts"
+            else:
+                message = f"Remove {len(paths)} unreferenced images"
+        for dest_file in synced_files:
+            paths.append(dest_file)
+            paths.extend(self.outputs.pop(dest_file, []))
+
+        labels = [self.post_name(f) for f in synced_files]
+        return paths if self.publisher.submit(paths, labels, message) else []
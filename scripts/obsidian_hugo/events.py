@@ -0,0 +1,157 @@
+"""
+Filesystem event plumbing shared by the watch modes.
+Events are merged per path in a CoalescingQueue and handed to the sync engine
+in batches once the vault has been quiet for a moment. Renames are also
+remembered as (old, new) pairs, so a moved note can follow its output instead
+of being published again from scratch. With a JobJournal, queued events
+survive the daemon being killed before their batch was synced.
+"""
+
+import threading
+import time
+from pathlib import Path
+
+
+class CoalescingQueue:
+    """Collects changed paths and releases them as one batch once things go quiet.
+
+    Repeated events for a path are merged. A batch is released when no event
+    has arrived for quiet_period seconds, or max_delay seconds after its first
+    event so that continuous editing still gets published. With a journal,
+    call done() once a batch has been synced and committed.
+    """
+
+    def __init__(self, quiet_period=2.0, max_delay=30.0, journal=None):
+        self.quiet_period = quiet_period
+        self.max_delay = max_delay
+        self.journal = journal
+        self.batch_seq = 0  # last journal record in the batch being synced
+        self.batch_first_event = None  # when the batch being synced began
+        self.pending = {}  # path -> None, kept in arrival order
+        self.moves = {}  # new path -> path it was renamed from
+        self.first_event = 0.0
+        self.last_event = 0.0
+        self.closed = False
+        self.received = 0
+        self.coalesced = 0
+        self._cond = threading.Condition()
+
+    def put(self, file_path, journaled=False):
+        """Record an event; never blocks on sync work."""
+        with self._cond:
+            now = time.monotonic()
+            if not self.pending:
+                self.first_event = now
+            self.last_event = now
+            self.received += 1
+            if self.journal is not None and not journaled:
+                self.journal.put(file_path)
+
+            if file_path in self.pending:
+                self.coalesced += 1
+            else:
+                self.pending[file_path] = None
+            self._cond.notify()
+
+    def put_move(self, old_path, new_path):
+        """Record a rename; both paths are queued as changed, too."""
+        with self._cond:
+            if self.journal is not None:
+                self.journal.move(old_path, new_path)
+            # a -> b -> c is one move from a to c
+            self.moves[new_path] = self.moves.pop(old_path, old_path)
+        self.put(old_path, journaled=True)
+        self.put(new_path, journaled=True)
+
+    def take_moves(self):
+        """Return and forget the renames seen so far, as (old, new) pairs."""
+        with self._cond:
+            moves = [(old, new) for new, old in self.moves.items() if old != new]
+            self.moves.clear()
+            return moves
+
+    def get_batch(self):
+        """Block until a batch is ready; returns None once closed and drained."""
+        with self._cond:
+            while True:
+                if not self.pending:
+                    if self.closed:
+                        return None
+                    self._cond.wait()
+                    continue
+
+                deadline = min(
+                    self.last_event + self.quiet_period,
+                    self.first_event + self.max_delay,
+                )
+                now = time.monotonic()
+                if self.closed or now >= deadline:
+                    batch = list(self.pending)
+                    self.pending.clear()
+                    self.batch_first_event = self.first_event
+                    if self.journal is not None:
+                        self.batch_seq = self.journal.seq
+                        self.journal.sync()
+                    return batch
+                self._cond.wait(deadline - now)
+
+    def recover(self):
+        """Return the batch a killed previous run left unfinished.
+
+        Its renames are queued for take_moves(); call done() once synced.
+        """
+        if self.journal is None:
+            return []
+        paths, moves, seq = self.journal.outstanding()
+        with self._cond:
+            for old_path, new_path in moves:
+                self.moves[new_path] = self.moves.pop(old_path, old_path)
+            self.batch_seq = seq
+        return paths
+
+    def done(self, seq=None):
+        """Mark the last batch handed out (or every record up to seq) as done.
+
+        A batch whose sync failed is not retried: the next batch's done()
+        completes its records too, and the notes it left stale are picked
+        up by the catch-up sync the next start runs.
+        """
+        if self.journal is not None:
+            self.journal.complete(self.batch_seq if seq is None else seq)
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+    def __len__(self):
+        with self._cond:
+            return len(self.pending)
+
+
+class QueueingEventHandler:
+    """Minimal watchdog event handler that feeds paths into a CoalescingQueue.
+
+    watchdog only calls dispatch(), so this does not need to subclass
+    FileSystemEventHandler and can be defined without watchdog installed.
+    """
+
+    def __init__(self, queue, accept=None):
+        self.queue = queue
+        self.accept = accept
+
+    def dispatch(self, event):
+        if event.is_directory:
+            return
+
+        paths = [
+            Path(path)
+            for path in (event.src_path, getattr(event, "dest_path", None))
+            if path
+        ]
+        paths = [p for p in paths if self.accept is None or self.accept(p)]
+        if event.event_type == "moved" and len(paths) == 2:
+            self.queue.put_move(*paths)
+        else:
+            for path in paths:
+                self.queue.put(path)
@@ -0,0 +1,53 @@
+"""
+Front matter reading and generation.
+Uses libyaml's C parser and emitter when PyYAML was built with them. Generated
+fields are derived only from the note and its stored first-seen date, so the
+same note always produces the same bytes.
+"""
+
+import os
+from datetime import datetime
+
+import yaml
+
+try:
+    from yaml import CSafeDumper as SafeDumper
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # PyYAML without libyaml
+    from yaml import SafeDumper, SafeLoader
+
+FRONT_MATTER_MARKERS = ("---", "+++")
+
+
+def has_front_matter(content):
+    return content.startswith(FRONT_MATTER_MARKERS)
+
+
+def load_front_matter(content):
+    """Parse a leading YAML front matter block; {} if there is none."""
+    if not content.startswith("---"):
+        return {}
+    end = content.find("\n---", 3)
+    if end == -1:
+        return {}
+    try:
+        fields = yaml.load(content[3:end], Loader=SafeLoader)
+    except yaml.YAMLError:
+        return {}
+    return fields if isinstance(fields, dict) else {}
+
+
+def dump_front_matter(fields):
+    """Serialize fields as a YAML front matter block."""
+    return (
+        "---\n"
+        + yaml.dump(fields, Dumper=SafeDumper, default_flow_style=False)
+        + "---\n\n"
+    )
+
+
+def file_date(path):
+    """Date a note was created, falling back to its modification time."""
+    st = os.stat(path)
+    timestamp = getattr(st, "st_birthtime", None) or st.st_mtime
+    return datetime.fromtimestamp(timestamp).isoformat(timespec="seconds")
@@ -0,0 +1,342 @@
+"""
+Scoped git commits for synced output.
+Only the paths a sync wrote or deleted are staged, nothing scans the whole
+worktree, and rapid syncs can be grouped into one commit/push per window.
+The "tree" commit mode goes further and never runs git commit, which
+refreshes the whole index: the changed files are hashed in one batch, only
+the trees above them are rebuilt, and the commit is made with commit-tree.
+"""
+
+import os
+import posixpath
+import stat
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+COMMIT_MODES = ("index", "tree")
+ZERO_ID = "0" * 40
+
+
+class GitPublisher:
+    """Commits (and optionally pushes) exactly the files a sync touched.
+
+    mode "index" stages the paths and runs git commit, hooks included; mode
+    "tree" builds the commit with plumbing, so its cost follows the number
+    of changed files and folders rather than the size of the repository.
+    """
+
+    def __init__(
+        self,
+        repo_dir=".",
+        describe=None,
+        push=False,
+        remote="origin",
+        branch="master",
+        window=0.0,
+        mode="index",
+    ):
+        if mode not in COMMIT_MODES:
+            raise ValueError(f"Unknown commit mode: {mode}")
+        self.repo_dir = Path(repo_dir).resolve()
+        self.describe = describe or (lambda labels: f"Sync {len(labels)} files")
+        self.push = push
+        self.remote = remote
+        self.branch = branch
+        self.window = window
+        self.mode = mode
+        self.metrics = None  # optional Metrics for commit and push latency
+
+        self.pending = {}  # repo-relative path -> None, in submission order
+        self.labels = []
+        self.message = None
+        self.callbacks = []  # run once the pending paths are committed
+        self._lock = threading.Lock()
+        self._commit_lock = threading.Lock()  # window timer vs explicit flush
+        self._timer = None
+        self._checked_repo = False
+
+    def _git(self, *args, input=None):
+        return subprocess.run(
+            ["git", *args],
+            cwd=self.repo_dir,
+            input=input,
+            capture_output=True,
+            check=True,
+        )
+
+    def _relative(self, path):
+        relative = os.path.relpath(os.path.abspath(path), self.repo_dir)
+        if relative.startswith(os.pardir):
+            return None
+        return relative
+
+    def submit(self, paths, labels, message=None):
+        """Queue written/deleted paths for the next commit.
+
+        Commits right away unless a window is set, in which case everything
+        submitted within the window goes into a single commit. Returns True if
+        a commit was made now.
+        """
+        with self._lock:
+            for path in paths:
+                relative = self._relative(path)
+                if relative is not None:
+                    self.pending[relative] = None
+            self.labels.extend(labels)
+            if message:
+                self.message = message
+
+            if self.window > 0:
+                if self._timer is None:
+                    self._timer = threading.Timer(self.window, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return False
+
+        return self.flush()
+
+    def after_commit(self, callback):
+        """Call callback once everything submitted so far is committed.
+
+        Calls it right away when nothing is waiting for a commit; otherwise
+        the flush that commits the pending paths calls it.
+        """
+        with self._commit_lock:  # let a commit in progress finish first
+            with self._lock:
+                if self.pending:
+                    self.callbacks.append(callback)
+                    return
+        callback()
+
+    def flush(self):
+        """Commit (and push) everything queued so far.
+
+        If git fails, the paths stay queued for the next flush, and so do
+        the after_commit callbacks waiting for them.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            paths = list(self.pending)
+            labels = list(dict.fromkeys(self.labels))
+            explicit = self.message
+            message = explicit or self.describe(labels)
+            callbacks = self.callbacks
+            self.pending, self.labels, self.message = {}, [], None
+            self.callbacks = []
+
+        with self._commit_lock:
+            try:
+                committed = bool(paths) and self.commit(paths, message)
+            except subprocess.CalledProcessError as e:
+                self._requeue(paths, labels, explicit, callbacks)
+                stderr = (e.stderr or b"").decode(errors="replace").strip()
+                print(f"✗ Git operation failed: {e}{': ' + stderr if stderr else ''}")
+                if self.metrics is not None:
+                    self.metrics.inc("git_failures_total")
+                return False
+
+        for callback in callbacks:
+            callback()
+        return committed
+
+    def _requeue(self, paths, labels, message, callbacks):
+        """Put a failed flush back in front of what was submitted since."""
+        with self._lock:
+            self.pending = {**dict.fromkeys(paths), **self.pending}
+            self.labels = labels + self.labels
+            self.message = self.message or message
+            self.callbacks = callbacks + self.callbacks
+
+    def commit(self, paths, message):
+        """Stage and commit only the given repo-relative paths."""
+        if not self._checked_repo:
+            self._git("rev-parse", "--git-dir")
+            self._checked_repo = True
+
+        started = time.perf_counter()
+        if self.mode == "tree":
+            changed = self.commit_tree(paths, message)
+        else:
+            changed = self.commit_index(paths, message)
+        self._observe("git_commit_seconds", started)
+        if not changed:
+            print("No changes to commit")
+            return False
+        print(f"✓ Committed {len(changed)} files: {message.splitlines()[0]}")
+
+        if self.push:
+            started = time.perf_counter()
+            self._git("push", self.remote, self.branch)
+            self._observe("git_push_seconds", started)
+            print("✓ Pushed to GitHub")
+
+        return True
+
+    def _observe(self, name, started):
+        if self.metrics is not None:
+            self.metrics.observe(name, time.perf_counter() - started)
+
+    def commit_index(self, paths, message):
+        """Commit through the index and git commit; returns the changed paths."""
+        # Stage additions, modifications and deletions of just these paths
+        self._git(
+            "update-index",
+            "--add",
+            "--remove",
+            "-z",
+            "--stdin",
+            input=b"".join(os.fsencode(p) + b"\0" for p in paths),
+        )
+
+        # Index vs HEAD for these paths only - no worktree scan. Without
+        # --no-renames a moved post would list only its new path and the
+        # deletion of the old one would never be committed
+        result = self._git(
+            "diff", "--cached", "--name-only", "--no-renames", "-z", "--", *paths
+        )
+        changed = [p for p in os.fsdecode(result.stdout).split("\0") if p]
+        if changed:
+            self._git("commit", "-q", "-m", message, "--", *changed)
+        return changed
+
+    def commit_tree(self, paths, message):
+        """Commit with plumbing only; returns the changed paths.
+
+        Existing paths are hashed with one hash-object --stdin-paths, each
+        folder above a change is rebuilt from its HEAD listing with mktree,
+        and HEAD moves with commit-tree and update-ref. The index gets the
+        same entries, so git status agrees with the new commit.
+        """
+        head = self._rev_parse("HEAD")
+
+        # One batched hash for every file that still exists
+        existing = [p for p in paths if os.path.isfile(self.repo_dir / p)]
+        blobs = {}
+        if existing:
+            result = self._git(
+                "hash-object",
+                "-w",
+                "--stdin-paths",
+                input=b"".join(os.fsencode(p) + b"\n" for p in existing),
+            )
+            blobs = dict(zip(existing, result.stdout.decode().split()))
+
+        entries = {}  # repo path -> (mode, blob id), or None to delete
+        for path in paths:
+            key = path.replace(os.sep, "/")
+            if path in blobs:
+                entries[key] = (self._file_mode(self.repo_dir / path), blobs[path])
+            else:
+                entries[key] = None
+
+        tree, changed = self._build_tree(head, entries)
+        if not changed:
+            return []
+
+        args = ["commit-tree", tree, "-m", message]
+        if head:
+            args += ["-p", head]
+        commit = self._git(*args).stdout.decode().strip()
+        self._git(
+            "update-ref",
+            "-m",
+            f"commit: {message.splitlines()[0]}",
+            "HEAD",
+            commit,
+            head or ZERO_ID,
+        )
+
+        # Mode 0 removes an entry from the index
+        index_info = []
+        for path in sorted(changed):
+            mode, object_id = entries[path] or ("0", ZERO_ID)
+            record = f"{mode} {object_id}\t".encode() + os.fsencode(path)
+            index_info.append(record + b"\0")
+        self._git("update-index", "-z", "--index-info", input=b"".join(index_info))
+        return sorted(changed)
+
+    def _rev_parse(self, rev):
+        result = subprocess.run(
+            ["git", "rev-parse", "-q", "--verify", rev],
+            cwd=self.repo_dir,
+            capture_output=True,
+        )
+        return result.stdout.decode().strip() if result.returncode == 0 else None
+
+    @staticmethod
+    def _file_mode(path):
+        return "100755" if os.stat(path).st_mode & stat.S_IXUSR else "100644"
+
+    def _ls_tree(self, head, folder):
+        """Return {name: (mode, type, id)} for a folder of HEAD."""
+        if head is None:
+            return {}
+        result = subprocess.run(
+            ["git", "ls-tree", "-z", f"{head}:{folder}"],
+            cwd=self.repo_dir,
+            capture_output=True,
+        )
+        if result.returncode != 0:
+            return {}  # the folder is new
+        listing = {}
+        for line in result.stdout.split(b"\0"):
+            if line:
+                info, name = line.split(b"\t", 1)
+                mode, kind, object_id = info.decode().split()
+                listing[os.fsdecode(name)] = (mode, kind, object_id)
+        return listing
+
+    def _build_tree(self, head, entries):
+        """Apply entries to HEAD's tree; returns (tree id, changed paths)."""
+        folders = {}  # folder -> {name: entry or None}
+        for path, entry in entries.items():
+            folder, name = posixpath.split(path)
+            folders.setdefault(folder, {})[name] = entry
+            # Every folder up to the root is rewritten too
+            while folder:
+                folder = posixpath.dirname(folder)
+                folders.setdefault(folder, {})
+
+        changed = set()
+        subtrees = {}  # folder -> new tree id, or None once empty
+        # Deepest folders first, so every parent sees its children's trees
+        order = sorted(folders, key=lambda f: f.count("/") + 1 if f else 0)
+        for folder in reversed(order):
+            listing = self._ls_tree(head, folder)
+            updated = dict(listing)
+            for name, entry in folders[folder].items():
+                path = posixpath.join(folder, name)
+                if entry is None:
+                    if name in updated and updated[name][1] == "blob":
+                        del updated[name]
+                        changed.add(path)
+                elif listing.get(name) != (entry[0], "blob", entry[1]):
+                    updated[name] = (entry[0], "blob", entry[1])
+                    changed.add(path)
+
+            for sub, tree in subtrees.items():
+                parent, name = posixpath.split(sub)
+                if parent != folder or not sub:
+                    continue
+                if tree is None:
+                    updated.pop(name, None)
+                else:
+                    updated[name] = ("040000", "tree", tree)
+
+            if not updated and folder:
+                subtrees[folder] = None
+                continue
+            subtrees[folder] = self._git(
+                "mktree",
+                "-z",
+                input=b"".join(
+                    f"{mode} {kind} {object_id}\t".encode() + os.fsencode(name) + b"\0"
+                    for name, (mode, kind, object_id) in updated.items()
+                ),
+            ).stdout.decode().strip()
+
+        return subtrees[""], changed
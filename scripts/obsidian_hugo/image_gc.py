@@ -0,0 +1,118 @@
+"""
+Garbage collection for images the sync published to static/images.
+References come from the sync manifests, so finding orphans never re-reads a
+post. By default only images that a post stopped embedding since the last
+collection are checked; a full sweep also lists static/images for the files
+a manifest recorded writing and the timestamped copies left by older
+versions of the sync. Other files (logos, favicons, hand-added images named
+like a hash, ...) are never touched.
+"""
+
+import os
+import re
+from pathlib import Path
+
+from .manifest import published_names
+from .state import load_state
+
+# <post>_<YYYYmmdd>_<HHMMSS>_<image> from the pre-content-hash sync
+LEGACY_NAME = re.compile(r"^.+_\d{8}_\d{6}_.+\.[A-Za-z0-9]+$")
+
+
+class ImageCollector:
+    """Finds and removes published images no synced post references."""
+
+    def __init__(self, images_dir, manifest, content_dir=None):
+        self.images_dir = Path(images_dir)
+        self.manifest = manifest
+        self.content_dir = Path(content_dir) if content_dir else None
+        self._published = None
+
+    def _other_manifests(self):
+        """Saved state of the other manifests kept next to this one.
+
+        Both sync scripts publish into the same static/images, so what they
+        reference and wrote counts too.
+        """
+        for path in self.manifest.path.parent.glob("*manifest.json"):
+            if path.resolve() == self.manifest.path.resolve():
+                continue
+            yield load_state(path, self.manifest.VERSION) or {}
+
+    def referenced(self):
+        """Absolute paths of every image a tracked post embeds."""
+        referenced = set(self.manifest.referenced_images())
+        for data in self._other_manifests():
+            for entry in data.get("entries", {}).values():
+                referenced.update(
+                    os.path.abspath(image["dest"]) for image in entry["images"]
+                )
+        return referenced
+
+    def published(self):
+        """Names of the images any of the manifests recorded writing."""
+        if self._published is None:
+            self._published = set(self.manifest.published)
+            for data in self._other_manifests():
+                self._published.update(published_names(data))
+        return self._published
+
+    def candidates(self, sweep=False):
+        """Images that may be orphaned: released ones, or all owned ones."""
+        candidates = {os.path.abspath(path) for path in self.manifest.released}
+        if sweep:
+            try:
+                with os.scandir(self.images_dir) as entries:
+                    for entry in entries:
+                        if entry.is_file() and self.owns(entry.name):
+                            candidates.add(os.path.abspath(entry.path))
+            except FileNotFoundError:
+                pass
+        return candidates
+
+    def owns(self, name):
+        """Whether the sync wrote an image: a recorded or legacy copy."""
+        return name in self.published() or bool(LEGACY_NAME.match(name))
+
+    def collect(self, dry_run=False, sweep=False):
+        """Remove (or with dry_run, just list) orphaned images.
+
+        Returns the orphaned paths, sorted.
+        """
+        referenced = self.referenced()
+        orphans = sorted(
+            Path(path)
+            for path in self.candidates(sweep)
+            if path not in referenced
+            and os.path.isfile(path)
+            and self.owns(os.path.basename(path))
+        )
+        orphans = self._drop_linked_legacy(orphans)
+
+        if not dry_run:
+            for path in orphans:
+                path.unlink(missing_ok=True)
+            self.manifest.clear_released()
+            self.manifest.collected(orphans)
+
+        return orphans
+
+    def _drop_linked_legacy(self, orphans):
+        """Keep legacy copies that some file under content/ still links to.
+
+        Legacy copies predate the manifest, so hand-written posts may embed
+        them. This scan only happens while such copies are left.
+        """
+        legacy = {p.name for p in orphans if p.name not in self.published()}
+        if not legacy or self.content_dir is None:
+            return orphans
+
+        linked = set()
+        for post in self.content_dir.rglob("*.md"):
+            try:
+                text = post.read_text(encoding="utf-8", errors="replace")
+            except OSError:
+                continue
+            linked.update(name for name in legacy if name in text)
+
+        return [p for p in orphans if p.name not in linked]
@@ -0,0 +1,107 @@
+"""
+Content-addressed image store for Hugo's static/images.
+Images are named after a hash of their bytes, so the same picture embedded by
+several posts (or synced many times) is stored and copied exactly once, and
+rewritten links stay stable between runs. New images are transferred with
+the cheapest strategy the filesystems allow (see transfer.py).
+"""
+
+import os
+import threading
+from pathlib import Path
+
+from .manifest import file_digest, stat_fingerprint
+from .transfer import FileTransfer
+
+
+class ImageStore:
+    """Publishes vault images under hash-derived names."""
+
+    def __init__(
+        self, images_dir, url_prefix="/images", digest_length=16, transfer="auto"
+    ):
+        self.images_dir = Path(images_dir)
+        self.url_prefix = url_prefix.rstrip("/")
+        self.digest_length = digest_length
+        self.transfer = FileTransfer(transfer)
+        self._digests = {}  # source path -> ((size, mtime_ns), digest)
+        self._locks = {}  # stored name -> lock, so workers never race on a file
+        self._locks_guard = threading.Lock()
+        self.stats = {"copied": 0, "reused": 0}
+        self.copies = {}  # stored name -> transfer strategy, for images copied here
+        self._copy_slots = None
+
+        self.images_dir.mkdir(parents=True, exist_ok=True)
+
+    def digest(self, source_image):
+        """Return the (cached) content digest of a source image."""
+        key = str(source_image)
+        fingerprint = stat_fingerprint(source_image)
+        cached = self._digests.get(key)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+
+        digest = file_digest(source_image)[: self.digest_length]
+        self._digests[key] = (fingerprint, digest)
+        return digest
+
+    def name_for(self, source_image):
+        """Return the stored file name for a source image."""
+        return self.digest(source_image) + Path(source_image).suffix.lower()
+
+    def publish(self, source_image):
+        """Make sure an image is in the store.
+
+        Returns (dest_path, url, copied) where copied names the transfer
+        strategy used, or is False when an image with identical bytes was
+        already present.
+        """
+        name = self.name_for(source_image)
+        dest_image = self.images_dir / name
+        url = f"{self.url_prefix}/{name}"
+
+        with self._lock_for(name):
+            if dest_image.exists():
+                self._count("reused")
+                return dest_image, url, False
+
+            # Copy under a temporary name first so a half-written file is
+            # never mistaken for a complete one by a later run
+            tmp_image = dest_image.with_name(f".{name}.{os.getpid()}.tmp")
+            if self._copy_slots is None:
+                strategy = self.transfer.copy(source_image, tmp_image)
+            else:
+                with self._copy_slots:
+                    strategy = self.transfer.copy(source_image, tmp_image)
+            # Recorded first: a memoized note may see the file right away
+            self.copies[name] = strategy
+            os.replace(tmp_image, dest_image)
+            self._count("copied")
+            return dest_image, url, strategy
+
+    def publish_embed(self, source_image):
+        """Publish an image for an embed.
+
+        Returns (link, dest_paths, copied) where link is the URL to embed.
+        Subclasses may return an object with a render(alt_text) method instead.
+        """
+        dest_image, url, copied = self.publish(source_image)
+        return url, [dest_image], copied
+
+    def limit_copies(self, count):
+        """Allow at most count image copies to run at once (None: no limit)."""
+        self._copy_slots = threading.BoundedSemaphore(count) if count else None
+
+    def wait(self):
+        """Wait for background image work; plain copies are synchronous."""
+
+    def _count(self, key):
+        with self._locks_guard:
+            self.stats[key] += 1
+
+    def _lock_for(self, name):
+        with self._locks_guard:
+            lock = self._locks.get(name)
+            if lock is None:
+                lock = self._locks[name] = threading.Lock()
+            return lock
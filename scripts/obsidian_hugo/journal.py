@@ -0,0 +1,109 @@
+"""
+Append-only journal of the watch daemon's sync jobs.
+Every queued event is appended as one JSON line before the worker sees it,
+and a batch is marked done only after its sync finished, state was saved
+and, with auto-commit, its commit was made. If the daemon dies in between,
+the next start replays just the events that were not done; everything else
+is already published.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+
+class JobJournal:
+    """Pending and in-flight sync jobs, persisted as JSON lines.
+
+    Records are {"seq": n, "put": path}, {"seq": n, "move": [old, new]} and
+    {"done": n}, which finishes every record up to n. The file is compacted
+    to the unfinished records on open and emptied whenever nothing is pending.
+    """
+
+    def __init__(self, path, fsync=True):
+        self.path = Path(path)
+        self.fsync = fsync
+        self.seq = 0
+        self._pending = []  # unfinished records found on open
+        self._lock = threading.Lock()
+        self._load()
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def _load(self):
+        records, done = [], 0
+        try:
+            with open(self.path, encoding="utf-8") as handle:
+                for line in handle:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from a crash
+                    if "done" in record:
+                        done = max(done, record["done"])
+                    elif "seq" in record:
+                        records.append(record)
+        except FileNotFoundError:
+            pass
+
+        self._pending = [record for record in records if record["seq"] > done]
+        self.seq = max((record["seq"] for record in records), default=0)
+
+        # Rewrite the file with only what is still outstanding
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(
+            "".join(json.dumps(record) + "\n" for record in self._pending),
+            encoding="utf-8",
+        )
+        os.replace(tmp_path, self.path)
+
+    def _append(self, record):
+        # One write per line, so a killed process leaves at most a torn tail
+        os.write(self._fd, (json.dumps(record) + "\n").encode("utf-8"))
+
+    def outstanding(self):
+        """Return (paths, moves, seq) left unfinished by the previous run.
+
+        seq is what to pass to complete() once they have been synced.
+        """
+        paths, moves = {}, []
+        for record in self._pending:
+            if "move" in record:
+                old_path, new_path = map(Path, record["move"])
+                moves.append((old_path, new_path))
+                paths[old_path] = paths[new_path] = None
+            else:
+                paths[Path(record["put"])] = None
+        last = self._pending[-1]["seq"] if self._pending else 0
+        return list(paths), moves, last
+
+    def put(self, path):
+        with self._lock:
+            self.seq += 1
+            self._append({"seq": self.seq, "put": str(path)})
+            return self.seq
+
+    def move(self, old_path, new_path):
+        with self._lock:
+            self.seq += 1
+            self._append({"seq": self.seq, "move": [str(old_path), str(new_path)]})
+            return self.seq
+
+    def sync(self):
+        """Make the records so far durable; called before a batch is synced."""
+        if self.fsync:
+            os.fsync(self._fd)
+
+    def complete(self, seq):
+        """Mark every record up to seq as done."""
+        with self._lock:
+            self._pending = [r for r in self._pending if r["seq"] > seq]
+            if seq >= self.seq:
+                # Nothing queued after this batch: start the journal afresh
+                os.ftruncate(self._fd, 0)
+            else:
+                self._append({"done": seq})
+
+    def close(self):
+        os.close(self._fd)
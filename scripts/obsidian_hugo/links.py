@@ -0,0 +1,241 @@
+"""
+Persistent wikilink graph for published notes.
+Maps every name a note can be linked by (file name, front matter aliases) to
+its Hugo page, and remembers which notes link to which names. Rewriting a
+[[Note]] link is a dictionary lookup, and when a note appears, disappears,
+moves or gains an alias only the notes linking to it have to be re-rendered.
+"""
+
+import posixpath
+import re
+import threading
+from pathlib import Path
+
+from .state import load_state, save_state
+
+# [[Note]], [[Note#Heading]], [[Note|label]] - but not ![[embeds]]
+WIKILINK_PATTERN = re.compile(
+    r"(?<!!)\[\[(?P<target>[^\[\]|#]*)"
+    r"(?:#(?P<heading>[^\[\]|]*))?(?:\|(?P<label>[^\[\]]*))?\]\]"
+)
+
+# Fenced code blocks and `inline code`, where Obsidian leaves [[links]] as typed
+CODE_PATTERN = re.compile(
+    r"^[ \t]{0,3}(?P<fence>`{3,}|~{3,}).*?(?:^[ \t]{0,3}(?P=fence)[`~]*[ \t]*$|\Z)"
+    r"|(?P<ticks>`+).+?(?<!`)(?P=ticks)(?!`)",
+    re.MULTILINE | re.DOTALL,
+)
+
+# Code is matched first, so a wikilink inside it is never seen on its own
+_LINK_OR_CODE = re.compile(
+    f"{CODE_PATTERN.pattern}|{WIKILINK_PATTERN.pattern}", CODE_PATTERN.flags
+)
+
+
+def link_key(target):
+    """Normalize a link target or note name the way Obsidian matches them."""
+    name = posixpath.basename(target.strip().replace("\\", "/")).lower()
+    return name[:-3] if name.endswith(".md") else name
+
+
+def anchorize(heading):
+    """Turn a heading into the anchor Hugo generates for it."""
+    anchor = re.sub(r"[^\w\- ]", "", heading.strip().lower())
+    return anchor.replace(" ", "-")
+
+
+def rewrite_wikilinks(content, resolve):
+    """Rewrite [[wikilinks]] in one pass.
+
+    resolve(target) returns the relref path of the linked page, or None; a
+    link that does not resolve is replaced by its label as plain text. Links
+    in code spans and fenced code blocks are left alone.
+    """
+    if "[[" not in content:
+        return content
+
+    def replace(match):
+        target, heading, label = match.group("target", "heading", "label")
+        if target is None:
+            return match.group(0)  # code
+        target = target.strip()
+        heading = (heading or "").strip()
+        text = (label or "").strip() or target or heading
+
+        if not target:
+            return f"[{text}](#{anchorize(heading)})" if heading else match.group(0)
+
+        ref = resolve(target)
+        if ref is None:
+            return text
+        if heading:
+            ref += "#" + anchorize(heading)
+        return f'[{text}]({{{{< relref "{ref}" >}}}})'
+
+    return _LINK_OR_CODE.sub(replace, content)
+
+
+def link_targets(content):
+    """Return the keys of every note content links to, outside code."""
+    if "[[" not in content:
+        return set()
+    return {
+        link_key(match.group("target"))
+        for match in _LINK_OR_CODE.finditer(content)
+        if match.group("target") and match.group("target").strip()
+    }
+
+
+class LinkIndex:
+    """Note names -> published pages, plus backlinks by name.
+
+    With published(source), links only resolve to notes it is truthy for,
+    i.e. notes whose page has been written.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path=None, published=None):
+        self.path = Path(path) if path else None
+        self.published = published
+        self.notes = {}  # source path -> {"slug", "keys", "links"}
+        self.by_key = {}  # link key -> set of source paths
+        self.backlinks = {}  # link key -> set of source paths linking to it
+        self.dirty = False
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if self.path is None:
+            return
+        data = load_state(self.path, self.VERSION)
+        if data is not None:
+            for source, note in data.get("notes", {}).items():
+                self._add(source, note)
+
+    def save(self):
+        if self.path is None or not self.dirty:
+            return
+        save_state(self.path, self.VERSION, {"notes": self.notes})
+        self.dirty = False
+
+    def _add(self, source, note):
+        self.notes[source] = note
+        for key in note["keys"]:
+            self.by_key.setdefault(key, set()).add(source)
+        for key in note["links"]:
+            self.backlinks.setdefault(key, set()).add(source)
+
+    def _remove(self, source):
+        note = self.notes.pop(source, None)
+        if note is None:
+            return None
+        for key in note["keys"]:
+            self._discard(self.by_key, key, source)
+        for key in note["links"]:
+            self._discard(self.backlinks, key, source)
+        return note
+
+    @staticmethod
+    def _discard(mapping, key, source):
+        sources = mapping.get(key)
+        if sources is not None:
+            sources.discard(source)
+            if not sources:
+                del mapping[key]
+
+    def resolve(self, target):
+        """Return the page a link target points to, or None."""
+        with self._lock:
+            sources = self.by_key.get(link_key(target), ())
+            if self.published is not None:
+                sources = [source for source in sources if self.published(source)]
+            if not sources:
+                return None
+            return self.notes[min(sources)]["slug"]
+
+    def dependents(self, keys):
+        """Return the notes that link to any of the given keys."""
+        found = set()
+        for key in keys:
+            found.update(self.backlinks.get(key, ()))
+        return {Path(source) for source in found}
+
+    def register(self, posts, slug_for):
+        """Track exactly the given published notes.
+
+        New, removed and moved notes change what their names resolve to;
+        returns the notes that link to them and need re-rendering.
+        """
+        current = {str(post): post for post in posts}
+        changed = set()
+        with self._lock:
+            for source in [s for s in self.notes if s not in current]:
+                changed.update(self._remove(source)["keys"])
+                self.dirty = True
+
+            for source, post in current.items():
+                slug = slug_for(post)
+                note = self.notes.get(source)
+                if note is None:
+                    note = {"slug": slug, "keys": [link_key(post.name)], "links": []}
+                    self._add(source, note)
+                elif note["slug"] == slug:
+                    continue
+                else:
+                    note["slug"] = slug
+                changed.update(note["keys"])
+                self.dirty = True
+
+            return self.dependents(changed)
+
+    def mark_published(self, source_file):
+        """A note's page was written for the first time.
+
+        Returns the notes whose links to it resolve now.
+        """
+        source = str(source_file)
+        with self._lock:
+            note = self.notes.get(source)
+            if note is None:
+                return set()
+            return self.dependents(note["keys"]) - {Path(source)}
+
+    def move(self, old_source, new_source):
+        """Re-key a renamed or moved note; its next update() diffs its names."""
+        with self._lock:
+            note = self._remove(str(old_source))
+            if note is not None:
+                self._add(str(new_source), note)
+                self.dirty = True
+
+    def forget(self, source_file):
+        """Stop tracking a note; returns the notes that linked to it."""
+        source = str(source_file)
+        with self._lock:
+            note = self._remove(source)
+            if note is None:
+                return set()
+            self.dirty = True
+            return self.dependents(note["keys"]) - {Path(source)}
+
+    def update(self, source_file, slug, aliases, links):
+        """Record a synced note's page, aliases and outgoing links.
+
+        Returns the other notes whose links to this one went stale.
+        """
+        source = str(source_file)
+        keys = sorted({link_key(Path(source).name), *map(link_key, aliases)})
+        note = {"slug": slug, "keys": keys, "links": sorted(links)}
+        with self._lock:
+            previous = self._remove(source)
+            self._add(source, note)
+            if previous == note:
+                return set()
+            self.dirty = True
+
+            if previous is None or previous["slug"] != slug:
+                changed = set(keys) | set(previous["keys"] if previous else ())
+            else:
+                changed = set(keys) ^ set(previous["keys"])
+            return self.dependents(changed) - {Path(source)}
@@ -0,0 +1,23 @@
+"""
+Loading the sync scripts as modules.
+Their file names contain dashes, so they cannot be imported normally.
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+
+def load_sync_engine(sync_script_path, module_name="obsidian_sync"):
+    """Import a sync script as a module."""
+    sync_script = Path(sync_script_path).resolve()
+
+    # The sync script imports the obsidian_hugo package that sits next to it
+    script_dir = str(sync_script.parent)
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+
+    spec = importlib.util.spec_from_file_location(module_name, sync_script)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
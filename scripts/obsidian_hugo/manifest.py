@@ -0,0 +1,283 @@
+"""
+Persistent sync manifest.
+Records, per source note, what was read and what was produced so that a sync
+run can skip notes whose source and referenced images are unchanged.
+"""
+
+import hashlib
+import io
+import os
+import posixpath
+from pathlib import Path
+
+from .attachments import clean_target
+from .state import load_state, save_state
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def text_digest(text):
+    """Return the SHA-256 hex digest of a string encoded as UTF-8."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def read_source(path):
+    """Read a note once, returning (text, digest of the raw bytes).
+
+    The text gets the same newline translation as Path.read_text().
+    """
+    raw = Path(path).read_bytes()
+    text = io.StringIO(raw.decode("utf-8"), newline=None).read()
+    return text, hashlib.sha256(raw).hexdigest()
+
+
+def published_names(data):
+    """Names of every image a saved manifest records as sync output."""
+    names = set(data.get("published", ()))
+    names.update(os.path.basename(dest) for dest in data.get("released", ()))
+    for entry in data.get("entries", {}).values():
+        names.update(os.path.basename(image["dest"]) for image in entry["images"])
+    return names
+
+
+def stat_fingerprint(path):
+    """Return (size, mtime_ns) for a path, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class SyncManifest:
+    """On-disk map of source path -> fingerprint, output hash and emitted images."""
+
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.entries = {}
+        self.released = set()  # image dests a post stopped embedding
+        self.published = set()  # names of the images the sync wrote, for sweeps
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        """Load the manifest from disk, starting empty if missing or unreadable."""
+        data = load_state(self.path, self.VERSION)
+        if data is not None:
+            self.entries = data.get("entries", {})
+            self.released = set(data.get("released", []))
+            self.published = published_names(data)
+
+    def save(self):
+        """Write the manifest atomically if anything changed."""
+        if not self.dirty:
+            return
+
+        save_state(
+            self.path,
+            self.VERSION,
+            {
+                "entries": self.entries,
+                "released": sorted(self.released),
+                "published": sorted(self.published),
+            },
+        )
+        self.dirty = False
+
+    def get(self, source_file):
+        return self.entries.get(str(source_file))
+
+    def first_seen(self, source_file):
+        """Return the date recorded when the note was first synced, if any."""
+        entry = self.get(source_file)
+        return entry.get("first_seen") if entry else None
+
+    def forget(self, source_file):
+        entry = self.entries.pop(str(source_file), None)
+        if entry is not None:
+            self.released.update(image["dest"] for image in entry["images"])
+            self.dirty = True
+
+    def move(self, old_source, new_source, output_file):
+        """Carry a renamed note's entry, first_seen date included, to its new path."""
+        entry = self.entries.pop(str(old_source), None)
+        if entry is not None:
+            entry["output"] = str(output_file)
+            self.entries[str(new_source)] = entry
+            self.dirty = True
+        return entry
+
+    def owner(self, output_file):
+        """Return the note an output file was written for, or None."""
+        output = str(output_file)
+        for source, entry in self.entries.items():
+            if entry["output"] == output:
+                return Path(source)
+        return None
+
+    def dropped(self, source_files):
+        """Return the tracked notes that are not among source_files."""
+        keep = {str(path) for path in source_files}
+        return [Path(source) for source in self.entries if source not in keep]
+
+    def referenced_images(self):
+        """Return the absolute paths of every image a tracked note embeds."""
+        return {
+            os.path.abspath(image["dest"])
+            for entry in self.entries.values()
+            for image in entry["images"]
+        }
+
+    def stage_keys(self):
+        """Return the memoized stage outputs tracked notes were rendered from."""
+        return {
+            key for entry in self.entries.values() for key in entry.get("stages", ())
+        }
+
+    def clear_released(self):
+        if self.released:
+            self.released.clear()
+            self.dirty = True
+
+    def collected(self, image_paths):
+        """Forget published images that were deleted."""
+        names = {Path(path).name for path in image_paths}
+        if names & self.published:
+            self.published -= names
+            self.dirty = True
+
+    def dependents(self, image_path):
+        """Return the source notes that embedded the given image."""
+        target = os.path.abspath(image_path)
+        return [
+            Path(source)
+            for source, entry in self.entries.items()
+            if any(os.path.abspath(i["source"]) == target for i in entry["images"])
+        ]
+
+    def waiting_for(self, image_path):
+        """Return the notes with an unresolved embed named like image_path."""
+        name = Path(image_path).name.lower()
+        return [
+            Path(source)
+            for source, entry in self.entries.items()
+            if any(
+                posixpath.basename(clean_target(target)).lower() == name
+                for target in entry.get("missing", ())
+            )
+        ]
+
+    def is_fresh(self, source_file, pipeline=None, resolve=None):
+        """Check whether a note's source, images and output are unchanged.
+
+        With a pipeline key, the note must also have been rendered by a
+        pipeline with the same stages and settings. With resolve(target,
+        source_file), embeds that matched no file must still match none.
+        """
+        entry = self.get(source_file)
+        if entry is None:
+            return False
+        if pipeline is not None and entry.get("pipeline") != pipeline:
+            return False
+
+        # The output must still be there and look like what we wrote
+        output = stat_fingerprint(entry["output"])
+        if output is None or output[0] != entry["output_size"]:
+            return False
+
+        # Every image the note pulled in must be unchanged and still published
+        for image in entry["images"]:
+            if stat_fingerprint(image["source"]) != (image["size"], image["mtime_ns"]):
+                return False
+            if not os.path.exists(image["dest"]):
+                return False
+
+        # An attachment added since may now satisfy an embed that was left as is
+        if resolve is not None:
+            if "missing" not in entry:
+                return False  # recorded before unresolved embeds were
+            for target in entry["missing"]:
+                if resolve(target, source_file) is not None:
+                    return False
+
+        current = stat_fingerprint(source_file)
+        if current is None:
+            return False
+        if current == (entry["size"], entry["mtime_ns"]):
+            return True
+
+        # Metadata moved (touch, checkout, copy) - fall back to the content hash
+        if current[0] != entry["size"] or file_digest(source_file) != entry["hash"]:
+            return False
+
+        entry["size"], entry["mtime_ns"] = current
+        self.dirty = True
+        return True
+
+    def record(
+        self,
+        source_file,
+        source_hash,
+        output_file,
+        output_text,
+        images,
+        first_seen=None,
+        stages=(),
+        pipeline=None,
+        missing=(),
+    ):
+        """Remember the result of syncing one note.
+
+        images is a list of (source_image, dest_image) path pairs. A first_seen
+        date, once recorded, is kept for as long as the note stays tracked.
+        stages and pipeline are the memo keys and pipeline key it was
+        rendered with; missing lists the embed targets that matched no file.
+        """
+        size, mtime_ns = stat_fingerprint(source_file)
+        image_entries = []
+        for source_image, dest_image in images:
+            self.published.add(Path(dest_image).name)
+            image_size, image_mtime = stat_fingerprint(source_image)
+            image_entries.append(
+                {
+                    "source": str(source_image),
+                    "dest": str(dest_image),
+                    "size": image_size,
+                    "mtime_ns": image_mtime,
+                }
+            )
+
+        previous = self.get(source_file)
+        if previous is not None:
+            kept = {image["dest"] for image in image_entries}
+            self.released.update(
+                image["dest"]
+                for image in previous["images"]
+                if image["dest"] not in kept
+            )
+
+        first_seen = self.first_seen(source_file) or first_seen
+        self.entries[str(source_file)] = {
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "hash": source_hash,
+            "output": str(output_file),
+            "output_size": len(output_text.encode("utf-8")),
+            "output_hash": text_digest(output_text),
+            "images": image_entries,
+            "stages": list(stages),
+            "pipeline": pipeline,
+            "missing": list(missing),
+        }
+        if first_seen:
+            self.entries[str(source_file)]["first_seen"] = first_seen
+        self.dirty = True
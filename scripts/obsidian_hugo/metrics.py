@@ -0,0 +1,222 @@
+"""
+Live metrics for the long-running watcher, in Prometheus text format.
+Metrics keeps counters, gauges and histograms in memory; values owned by
+other objects (queue depth, image store stats, ...) are read when scraped.
+serve_metrics exposes them over HTTP on a TCP port or a Unix socket, so a
+stuck or slow watcher can be alerted on.
+"""
+
+import http.server
+import os
+import socketserver
+import stat
+import threading
+import time
+from contextlib import contextmanager
+
+from .profiler import NullProfiler, StageRecord
+
+# Seconds; covers a memoized note up to a slow git push
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """A small registry of named series, rendered in Prometheus text format.
+
+    Every metric is declared once with its type and help text; series are
+    keyed by their label values.
+    """
+
+    def __init__(self, namespace="obsidian_sync", buckets=DEFAULT_BUCKETS):
+        self.namespace = namespace
+        self.buckets = tuple(buckets)
+        self._kinds = {}  # name -> (type, help)
+        self._series = {}  # name -> {labels: value or [bucket counts, sum, count]}
+        self._collectors = {}  # name -> func returning {labels: value} or a value
+        self._lock = threading.Lock()
+
+    def describe(self, name, kind, help_text, collect=None):
+        """Declare a counter, gauge or histogram; collect() is read when scraped."""
+        self._kinds[name] = (kind, help_text)
+        self._series.setdefault(name, {})
+        if collect is not None:
+            self._collectors[name] = collect
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series[name]
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[name][key] = value
+
+    def replace(self, name, value, **labels):
+        """Make this the metric's only series, e.g. for info-style metrics."""
+        with self._lock:
+            self._series[name] = {tuple(sorted(labels.items())): value}
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series[name]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        for name, (kind, help_text) in self._kinds.items():
+            full_name = f"{self.namespace}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+
+            with self._lock:
+                series = dict(self._series[name])
+            collect = self._collectors.get(name)
+            if collect is not None:
+                collected = collect()
+                if not isinstance(collected, dict):
+                    collected = {(): collected}
+                series.update(collected)
+
+            for key, value in sorted(series.items()):
+                if kind == "histogram":
+                    counts, total, count = value
+                    for bound, bucket in zip(self.buckets, counts):
+                        le = (("le", _number(bound)),)
+                        lines.append(f"{full_name}_bucket{_labels(key, le)} {bucket}")
+                    le = (("le", "+Inf"),)
+                    lines.append(f"{full_name}_bucket{_labels(key, le)} {count}")
+                    lines.append(f"{full_name}_sum{_labels(key)} {_number(total)}")
+                    lines.append(f"{full_name}_count{_labels(key)} {count}")
+                else:
+                    lines.append(f"{full_name}{_labels(key)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsProfiler(NullProfiler):
+    """Profiler hooks that feed stage durations and I/O into Metrics."""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        metrics.describe(
+            "stage_duration_seconds", "histogram", "Time spent per sync stage."
+        )
+        metrics.describe("stage_files_total", "counter", "Files handled per stage.")
+        metrics.describe(
+            "stage_bytes_read_total", "counter", "Bytes read per sync stage."
+        )
+        metrics.describe(
+            "stage_bytes_written_total", "counter", "Bytes written per sync stage."
+        )
+
+    @contextmanager
+    def stage(self, name, post=None):
+        record = StageRecord()
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            metrics = self.metrics
+            metrics.observe(
+                "stage_duration_seconds", time.perf_counter() - started, stage=name
+            )
+            if record.files:
+                metrics.inc("stage_files_total", record.files, stage=name)
+            if record.bytes_read:
+                metrics.inc("stage_bytes_read_total", record.bytes_read, stage=name)
+            if record.bytes_written:
+                metrics.inc(
+                    "stage_bytes_written_total", record.bytes_written, stage=name
+                )
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    metrics = None  # set on the per-server subclass
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket peers have no address
+        return str(self.client_address[0]) if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        pass  # scrapes would drown out the watcher's own output
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name, self.server_port = "localhost", 0
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def serve_metrics(metrics, address):
+    """Serve metrics in the background; returns the server (call shutdown()).
+
+    address is "unix:/path/to/socket", "host:port" or just a port, which
+    binds to 127.0.0.1.
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"metrics": metrics})
+    if address.startswith("unix:"):
+        path = address[len("unix:") :]
+        try:
+            if stat.S_ISSOCK(os.stat(path).st_mode):
+                os.unlink(path)  # left behind by a previous run
+        except FileNotFoundError:
+            pass
+        server = _UnixHTTPServer(path, handler)
+    else:
+        host, _, port = address.rpartition(":")
+        server = http.server.ThreadingHTTPServer(
+            (host or "127.0.0.1", int(port)), handler
+        )
+
+    thread = threading.Thread(
+        target=server.serve_forever, name="obsidian-sync-metrics", daemon=True
+    )
+    thread.start()
+    return server
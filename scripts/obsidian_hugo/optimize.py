@@ -0,0 +1,173 @@
+"""
+Optional image optimization stage.
+Re-encodes raster images as WebP at a few responsive widths on a process pool.
+Variant names are derived from the source hash and the encoder settings, so
+each image is optimized once per settings change and links are known before
+encoding finishes. Requires Pillow; without it images are copied unchanged.
+"""
+
+import hashlib
+import html
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from .image_store import ImageStore
+from .parallel import log
+
+try:
+    from PIL import Image
+except ImportError:  # optimization is optional
+    Image = None
+
+OPTIMIZABLE_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tif", ".tiff"}
+DEFAULT_WIDTHS = (480, 960, 1600)
+
+
+def encode_variant(source_image, dest_image, width, quality):
+    """Downscale one image to width and write it as WebP (runs in a worker)."""
+    with Image.open(source_image) as image:
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        if image.width > width:
+            height = round(image.height * width / image.width)
+            image = image.resize((width, height), Image.LANCZOS)
+
+        tmp_image = f"{dest_image}.{os.getpid()}.tmp"
+        try:
+            image.save(tmp_image, "WEBP", quality=quality, method=6)
+        except BaseException:
+            # Pillow may have created the file before failing
+            if os.path.exists(tmp_image):
+                os.unlink(tmp_image)
+            raise
+    os.replace(tmp_image, dest_image)
+    return dest_image
+
+
+def create_image_store(images_dir, optimize=False, transfer="auto", **settings):
+    """Return an OptimizingImageStore if requested and Pillow is available."""
+    if not optimize:
+        return ImageStore(images_dir, transfer=transfer)
+    if Image is None:
+        print("Pillow is not installed; images will be copied unoptimized")
+        return ImageStore(images_dir, transfer=transfer)
+    return OptimizingImageStore(images_dir, transfer=transfer, **settings)
+
+
+def parse_widths(value):
+    """argparse type for a comma-separated list of widths."""
+    return [int(width) for width in value.split(",") if width.strip()]
+
+
+class ResponsiveImage:
+    """An optimized image published at one or more widths."""
+
+    def __init__(self, variants):
+        self.variants = sorted(variants)  # [(width, url)]
+
+    @property
+    def url(self):
+        return self.variants[-1][1]
+
+    def render(self, alt_text):
+        """Return the markdown (or <img srcset> HTML) for this image."""
+        if len(self.variants) == 1:
+            return f"![{alt_text}]({self.url})"
+
+        largest = self.variants[-1][0]
+        srcset = ", ".join(f"{url} {width}w" for width, url in self.variants)
+        return (
+            f'<img src="{self.url}" srcset="{srcset}" '
+            f'sizes="(max-width: {largest}px) 100vw, {largest}px" '
+            f'alt="{html.escape(alt_text)}" loading="lazy">'
+        )
+
+
+class OptimizingImageStore(ImageStore):
+    """ImageStore that publishes raster images as cached WebP variants."""
+
+    def __init__(
+        self,
+        images_dir,
+        url_prefix="/images",
+        widths=DEFAULT_WIDTHS,
+        quality=80,
+        jobs=None,
+        transfer="auto",
+    ):
+        super().__init__(images_dir, url_prefix=url_prefix, transfer=transfer)
+        self.widths = sorted(set(widths))
+        self.quality = quality
+        self.jobs = jobs
+        settings = {"format": "webp", "quality": quality, "widths": self.widths}
+        self.settings_key = hashlib.sha256(
+            json.dumps(settings, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:6]
+
+        self._executor = None
+        self._pending = {}  # dest name -> future
+        self._pending_lock = threading.Lock()
+
+    def variant_widths(self, source_width):
+        """Widths to publish for an image that is source_width pixels wide."""
+        widths = [w for w in self.widths if w < source_width]
+        widths.append(min(source_width, self.widths[-1]))
+        return sorted(set(widths))
+
+    def publish_embed(self, source_image):
+        if Image is None or source_image.suffix.lower() not in OPTIMIZABLE_SUFFIXES:
+            return super().publish_embed(source_image)
+
+        try:
+            with Image.open(source_image) as image:  # reads the header only
+                source_width = image.width
+        except Exception as e:
+            log(f"  ! Not optimizing {source_image.name}: {e}")
+            return super().publish_embed(source_image)
+
+        digest = self.digest(source_image)
+        variants, dests = [], []
+        for width in self.variant_widths(source_width):
+            name = f"{digest}-{width}w-{self.settings_key}.webp"
+            dest_image = self.images_dir / name
+            variants.append((width, f"{self.url_prefix}/{name}"))
+            dests.append(dest_image)
+            if dest_image.exists():
+                self._count("reused")
+            else:
+                self._submit(source_image, dest_image, width)
+
+        # Encodes report themselves from wait(), so nothing counts as copied
+        return ResponsiveImage(variants), dests, False
+
+    def _submit(self, source_image, dest_image, width):
+        with self._pending_lock:
+            if dest_image.name in self._pending:
+                return
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.jobs)
+            self._pending[dest_image.name] = self._executor.submit(
+                encode_variant, str(source_image), str(dest_image), width, self.quality
+            )
+
+    def wait(self):
+        """Wait for queued encodes, reporting any that failed.
+
+        The worker processes are shut down too; the next encode starts a
+        new pool.
+        """
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+            executor, self._executor = self._executor, None
+
+        for name, future in pending.items():
+            try:
+                future.result()
+                log(f"  ✓ Optimized image: {name}")
+            except Exception as e:
+                log(f"  ✗ Failed to optimize {name}: {e}")
+
+        if executor is not None:
+            executor.shutdown()
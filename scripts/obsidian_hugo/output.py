@@ -0,0 +1,53 @@
+"""
+Atomic, skip-if-identical writes for generated posts.
+An output is only rewritten when its bytes actually change, so unchanged posts
+keep their mtimes and hugo server / git have nothing to re-check. A size
+mismatch decides most cases without reading the old file. Writes go through a
+temporary file and a rename, so a crash never leaves a truncated post behind.
+"""
+
+import os
+import threading
+from pathlib import Path
+
+
+class OutputWriter:
+    """Writes generated files only when their content changed."""
+
+    def __init__(self):
+        self.stats = {"written": 0, "unchanged": 0}
+        self._lock = threading.Lock()
+
+    def write_text(self, path, text):
+        """Write text as UTF-8 unless path holds it already; True if written."""
+        return self.write_bytes(path, text.encode("utf-8"))
+
+    def write_bytes(self, path, data):
+        path = Path(path)
+        changed = not self.is_identical(path, data)
+        if changed:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(
+                f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+            )
+            try:
+                tmp_path.write_bytes(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                tmp_path.unlink(missing_ok=True)
+                raise
+
+        with self._lock:
+            self.stats["written" if changed else "unchanged"] += 1
+        return changed
+
+    @staticmethod
+    def is_identical(path, data):
+        """Check whether path already holds exactly data."""
+        try:
+            if os.stat(path).st_size != len(data):
+                return False
+            with open(path, "rb") as handle:
+                return handle.read() == data
+        except OSError:
+            return False
@@ -0,0 +1,77 @@
+"""
+Thread pool runner for per-post sync work.
+Workers buffer their console output so that messages and results come out in
+the same order as a serial run.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_local = threading.local()
+
+
+class _Once:
+    """A held-back message that only the first post to print it prints."""
+
+    def __init__(self, seen, key, message):
+        self.seen = seen
+        self.key = key
+        self.message = message
+
+
+def print_message(message):
+    """Print a message log() or log_once() held back."""
+    if isinstance(message, _Once):
+        if message.key in message.seen:
+            return
+        message.seen.add(message.key)
+        message = message.message
+    print(message)
+
+
+def log(message=""):
+    """Print a message, or hold it back while a pool worker is syncing a post."""
+    buffer = getattr(_local, "buffer", None)
+    if buffer is None:
+        print_message(message)
+    else:
+        buffer.append(message)
+
+
+def log_once(seen, key, message):
+    """Like log(), but only the first message for key is printed.
+
+    Keys are added to seen as they are printed. Held-back messages are
+    checked when printed, so the post that prints one is the first in input
+    order, whichever worker got there first.
+    """
+    log(_Once(seen, key, message))
+
+
+def call_buffered(messages, func, *args):
+    """Call func, collecting its log() messages in messages instead of printing."""
+    _local.buffer = messages
+    try:
+        return func(*args)
+    finally:
+        _local.buffer = None
+
+
+def _run_buffered(func, item):
+    messages = []
+    return call_buffered(messages, func, item), messages
+
+
+def map_posts(func, posts, jobs=1):
+    """Yield (post, func(post)) in input order, running up to jobs at a time."""
+    if jobs <= 1:
+        for post in posts:
+            yield post, func(post)
+        return
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(lambda post: _run_buffered(func, post), posts)
+        for post, (result, messages) in zip(posts, results):
+            for message in messages:
+                print_message(message)
+            yield post, result
@@ -0,0 +1,316 @@
+"""
+Composable transform pipeline for notes.
+A note passes through registered stages (embeds, wikilinks, front matter, ...)
+that share one Note object, so front matter is parsed at most once. Each
+stage's output is memoized under a key made from the stage's configuration
+and the hash of its input; changing one stage's settings changes its key and
+therefore the input of every later stage, so only that stage and the ones
+after it run again.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from .frontmatter import dump_front_matter, has_front_matter, load_front_matter
+from .links import link_key, link_targets, rewrite_wikilinks
+from .manifest import stat_fingerprint, text_digest
+from .profiler import NullProfiler
+
+
+class Note:
+    """A note moving through the pipeline, plus what stages learned about it."""
+
+    def __init__(self, source_file, text):
+        self.source_file = Path(source_file)
+        self._text = text
+        self._front_matter = None
+        self.images = []  # (source, dest) pairs published for embeds
+        self.missing = []  # embed targets that matched no file
+        self.first_seen = None  # date generated front matter was stamped with
+        self.stage_keys = []
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        if value != self._text:
+            self._text = value
+            self._front_matter = None
+
+    @property
+    def has_front_matter(self):
+        return has_front_matter(self._text)
+
+    @property
+    def front_matter(self):
+        """The parsed YAML front matter, shared by every stage."""
+        if self._front_matter is None:
+            self._front_matter = load_front_matter(self._text)
+        return self._front_matter
+
+
+class Stage:
+    """One transformation. Subclasses set name and implement apply."""
+
+    name = "stage"
+    version = 1
+
+    def config(self):
+        """Settings that change this stage's output (must be JSON-able)."""
+        return {}
+
+    def key(self):
+        return json.dumps(
+            {"stage": self.name, "version": self.version, "config": self.config()},
+            sort_keys=True,
+        )
+
+    def apply(self, note):
+        """Return (text, extra); extra is JSON-able data replay() gets back."""
+        raise NotImplementedError
+
+    def replay(self, note, extra):
+        """Reuse a memoized result: redo side effects, or return False if stale."""
+        return True
+
+
+class StageCache:
+    """Memoized stage outputs, one small JSON file per key."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def _path(self, key):
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key):
+        try:
+            return json.loads(self._path(key).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, value):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Notes with identical text share keys, so worker threads can put the
+        # same key at once; each needs its own temporary file
+        tmp_path = path.with_name(
+            f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        try:
+            tmp_path.write_text(json.dumps(value), encoding="utf-8")
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def prune(self, keep):
+        """Delete memoized outputs whose keys are not in keep."""
+        removed = 0
+        try:
+            buckets = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return removed
+        for bucket in buckets:
+            if not bucket.is_dir():
+                continue
+            with os.scandir(bucket.path) as entries:
+                for entry in entries:
+                    if entry.name.removesuffix(".json") not in keep:
+                        os.unlink(entry.path)
+                        removed += 1
+        return removed
+
+
+class Pipeline:
+    """Runs a note through its stages, reusing memoized stage outputs."""
+
+    def __init__(self, stages, cache=None, profiler=None):
+        self.stages = list(stages)
+        self.cache = cache
+        self.profiler = profiler or NullProfiler()
+        self.stats = {"memoized": 0, "ran": 0}
+
+    def key(self):
+        """Identifies the stage list and settings, for output freshness."""
+        return text_digest("\n".join(stage.key() for stage in self.stages))
+
+    def run(self, note):
+        """Transform note in place and return its final text."""
+        note.stage_keys = []
+        for stage in self.stages:
+            key = hashlib.sha256(
+                f"{stage.key()}\0{text_digest(note.text)}".encode("utf-8")
+            ).hexdigest()
+            note.stage_keys.append(key)
+
+            with self.profiler.stage(stage.name, note.source_file):
+                cached = self.cache.get(key) if self.cache is not None else None
+                if cached is not None and stage.replay(note, cached["extra"]):
+                    note.text = cached["text"]
+                    self.stats["memoized"] += 1
+                    continue
+
+                text, extra = stage.apply(note)
+                note.text = text
+                self.stats["ran"] += 1
+                if self.cache is not None:
+                    self.cache.put(key, {"text": text, "extra": extra})
+
+        return note.text
+
+
+class EmbedStage(Stage):
+    """Publishes embedded images and rewrites the embeds to their URLs.
+
+    process(content, source_file, emitted_images, resolved) rewrites the
+    embeds; resolve(target, source_file) is the engine's resolution rule.
+    """
+
+    name = "embeds"
+
+    def __init__(self, process, resolve, settings=None):
+        self.process = process
+        self.resolve = resolve
+        self.settings = settings
+
+    def config(self):
+        return {"images": self.settings}
+
+    def apply(self, note):
+        images, resolved = [], {}
+        text = self.process(note.text, note.source_file, images, resolved)
+        note.images.extend(images)
+        note.missing.extend(t for t, source in resolved.items() if source is None)
+        extra = {
+            "targets": {
+                target: str(source) if source else None
+                for target, source in resolved.items()
+            },
+            "images": [
+                [str(source), str(dest), *stat_fingerprint(source)]
+                for source, dest in images
+            ],
+        }
+        return text, extra
+
+    def replay(self, note, extra):
+        # Targets must resolve to the same files, which must be unchanged
+        for target, source in extra["targets"].items():
+            current = self.resolve(target, note.source_file)
+            if (str(current) if current else None) != source:
+                return False
+        for source, dest, size, mtime_ns in extra["images"]:
+            if stat_fingerprint(source) != (size, mtime_ns):
+                return False
+            if not os.path.exists(dest):
+                return False
+
+        note.images.extend((Path(src), Path(dest)) for src, dest, *_ in extra["images"])
+        note.missing.extend(t for t, src in extra["targets"].items() if src is None)
+        return True
+
+
+class LinkStage(Stage):
+    """Rewrites [[wikilinks]] through the link graph and keeps it current.
+
+    on_stale receives the notes whose links to this one resolve differently.
+    """
+
+    name = "links"
+
+    def __init__(self, index, slug_for, on_stale):
+        self.index = index
+        self.slug_for = slug_for
+        self.on_stale = on_stale
+
+    def config(self):
+        return {"slug": self.slug_for(Path("note.md"))}
+
+    def _record(self, note, aliases, links):
+        self.on_stale(
+            self.index.update(
+                note.source_file, self.slug_for(note.source_file), aliases, links
+            )
+        )
+
+    def apply(self, note):
+        aliases = []
+        if note.has_front_matter and "aliases" in note.text:
+            aliases = note.front_matter.get("aliases") or []
+            if isinstance(aliases, str):
+                aliases = [aliases]
+        aliases = [str(alias) for alias in aliases]
+        links = sorted(link_targets(note.text))
+        self._record(note, aliases, links)
+
+        resolved = {}
+
+        def resolve(target):
+            slug = self.index.resolve(target)
+            resolved[link_key(target)] = slug
+            return slug
+
+        text = rewrite_wikilinks(note.text, resolve)
+        return text, {"aliases": aliases, "links": links, "resolved": resolved}
+
+    def replay(self, note, extra):
+        for key, slug in extra["resolved"].items():
+            if self.index.resolve(key) != slug:
+                return False
+        self._record(note, extra["aliases"], extra["links"])
+        return True
+
+
+class FrontMatterStage(Stage):
+    """Adds Hugo front matter to notes that have none.
+
+    Generated fields come from the file name, defaults and date_for(source),
+    which should be stable (e.g. a stored first-seen date).
+    """
+
+    name = "front_matter"
+    version = 2
+
+    def __init__(self, defaults, date_for):
+        self.defaults = dict(defaults)
+        self.date_for = date_for
+
+    def config(self):
+        return {"defaults": self.defaults}
+
+    @staticmethod
+    def title(source_file):
+        return source_file.stem.replace("-", " ").replace("_", " ").title()
+
+    def render(self, content, source_file, date):
+        fields = {
+            "title": self.title(source_file),
+            "date": date,
+            **self.defaults,
+        }
+        return dump_front_matter(fields) + content
+
+    def apply(self, note):
+        if note.has_front_matter:
+            return note.text, {"date": None}
+        date = self.date_for(note.source_file)
+        note.first_seen = date
+        extra = {"date": date, "title": self.title(note.source_file)}
+        return self.render(note.text, note.source_file, date), extra
+
+    def replay(self, note, extra):
+        date = extra["date"]
+        if date is not None:
+            # A renamed note keeps its text but gets a new generated title
+            if extra["title"] != self.title(note.source_file):
+                return False
+            if self.date_for(note.source_file) != date:
+                return False
+            note.first_seen = date
+        return True
@@ -0,0 +1,205 @@
+"""
+Per-stage timing and I/O accounting for sync runs.
+SyncProfiler records wall time, bytes read/written and file counts per stage,
+for each post and for the whole run. NullProfiler is the default and makes
+every hook a no-op so unprofiled runs pay next to nothing.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+STAGES = (
+    "scan",
+    "classify",
+    "read",
+    "embeds",
+    "image_resolve",
+    "image_copy",
+    "links",
+    "front_matter",
+    "write",
+)
+
+
+class StageRecord:
+    """Counters for one stage, filled in by the code being profiled."""
+
+    __slots__ = ("seconds", "calls", "files", "bytes_read", "bytes_written")
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.calls = 0
+        self.files = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def __bool__(self):
+        return True
+
+    def merge(self, other):
+        self.seconds += other.seconds
+        self.calls += other.calls
+        self.files += other.files
+        self.bytes_read += other.bytes_read
+        self.bytes_written += other.bytes_written
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class _NullRecord:
+    """Accepts counter updates and drops them; falsy so callers can skip work."""
+
+    __slots__ = ()
+
+    def __bool__(self):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    files = bytes_read = bytes_written = 0
+
+
+_NULL_RECORD = _NullRecord()
+
+
+class NullProfiler:
+    """Profiler used when --profile is off."""
+
+    enabled = False
+
+    def stage(self, name, post=None):
+        return _NULL_RECORD
+
+    def iterate(self, name, iterable):
+        return iterable
+
+    def start(self):
+        pass
+
+    def finish(self):
+        pass
+
+
+class SyncProfiler:
+    """Collects stage timings and I/O for a run and for each post."""
+
+    enabled = True
+
+    def __init__(self):
+        self.run = {}
+        self.posts = {}
+        self.post_seconds = {}  # per post, outermost stages only
+        self.started = None
+        self.wall_seconds = 0.0
+        self._lock = threading.Lock()
+        self._depth = threading.local()  # stages open on this thread
+
+    def start(self):
+        self.started = time.perf_counter()
+
+    def finish(self):
+        if self.started is not None:
+            self.wall_seconds = time.perf_counter() - self.started
+
+    @contextmanager
+    def stage(self, name, post=None):
+        """Time a block; the yielded record takes files/bytes counters.
+
+        Stages may nest (image_copy runs inside embeds); each stage's time
+        includes its nested stages.
+        """
+        record = StageRecord()
+        depth = getattr(self._depth, "value", 0)
+        self._depth.value = depth + 1
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.seconds = time.perf_counter() - started
+            record.calls = 1
+            self._depth.value = depth
+            with self._lock:
+                self.run.setdefault(name, StageRecord()).merge(record)
+                if post is not None:
+                    post = str(post)
+                    stages = self.posts.setdefault(post, {})
+                    stages.setdefault(name, StageRecord()).merge(record)
+                    if depth == 0:
+                        self.post_seconds[post] = (
+                            self.post_seconds.get(post, 0.0) + record.seconds
+                        )
+
+    def iterate(self, name, iterable):
+        """Yield from iterable, charging the time spent producing items to name."""
+        record = StageRecord()
+        iterator = iter(iterable)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    record.seconds += time.perf_counter() - started
+                record.files += 1
+                yield item
+        finally:
+            record.calls = 1
+            with self._lock:
+                self.run.setdefault(name, StageRecord()).merge(record)
+
+    def post_totals(self):
+        """Return [(post, seconds)] with the time spent on each post."""
+        # Summing every stage would count nested stages twice
+        return list(self.post_seconds.items())
+
+    def report(self):
+        """Return the run and per-post counters as JSON-ready data."""
+        return {
+            "wall_seconds": self.wall_seconds,
+            "stages": {name: record.as_dict() for name, record in self.run.items()},
+            "posts": {
+                post: {name: record.as_dict() for name, record in stages.items()}
+                for post, stages in self.posts.items()
+            },
+        }
+
+    def write(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.report(), indent=2), encoding="utf-8")
+
+    def print_summary(self, top=10):
+        """Print the per-stage totals and the top slowest posts."""
+        print(f"\nProfile ({self.wall_seconds * 1000:.1f} ms wall):")
+        print(
+            f"  {'stage':<14} {'ms':>10} {'files':>7} "
+            f"{'read KiB':>10} {'written KiB':>12}"
+        )
+        ordered = [s for s in STAGES if s in self.run]
+        ordered += sorted(s for s in self.run if s not in STAGES)
+        for name in ordered:
+            record = self.run[name]
+            print(
+                f"  {name:<14} {record.seconds * 1000:>10.1f} {record.files:>7} "
+                f"{record.bytes_read / 1024:>10.1f} "
+                f"{record.bytes_written / 1024:>12.1f}"
+            )
+
+        slowest = sorted(self.post_totals(), key=lambda item: item[1], reverse=True)
+        if slowest:
+            print(f"\n  Slowest {min(top, len(slowest))} posts:")
+            for post, seconds in slowest[:top]:
+                print(f"  {seconds * 1000:>10.1f} ms  {post}")
@@ -0,0 +1,35 @@
+"""
+Helpers for the small JSON state files kept under .obsidian-sync/.
+"""
+
+import json
+import os
+from pathlib import Path
+
+
+def load_state(path, version):
+    """Load a versioned JSON state file, returning None if it is unusable."""
+    path = Path(path)
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable state file {path}: {e}")
+        return None
+
+    if not isinstance(data, dict) or data.get("version") != version:
+        print(f"State file {path} has an old format, rebuilding")
+        return None
+
+    return data
+
+
+def save_state(path, version, payload):
+    """Atomically write a versioned JSON state file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    data = dict(payload, version=version)
+    tmp_path.write_text(json.dumps(data, indent=1, sort_keys=True), encoding="utf-8")
+    os.replace(tmp_path, path)
@@ -0,0 +1,148 @@
+"""
+Kernel-side file transfer for published images.
+Tries the cheapest way to put a file's bytes at a new path: a reflink clone
+shares the blocks (copy-on-write), copy_file_range and sendfile copy inside
+the kernel, and a hard link shares the inode. Whatever the filesystem does
+not support is skipped, remembered per device pair, and the chain ends in a
+plain userspace copy.
+"""
+
+import errno
+import os
+import shutil
+import sys
+import threading
+
+try:
+    import fcntl
+except ImportError:  # not on Windows
+    fcntl = None
+
+# _IOW(0x94, 9, int) from linux/fs.h
+FICLONE = getattr(fcntl, "FICLONE", 0x40049409)
+
+# Transfer modes and the strategies they try, in order. Hard links are only
+# used when asked for: the published file then shares its inode with the
+# vault file, so editing the image in place would change it under its old
+# content-hash name as well
+TRANSFER_MODES = {
+    "auto": ("reflink", "copy_file_range", "sendfile", "copy"),
+    "hardlink": ("hardlink", "reflink", "copy_file_range", "sendfile", "copy"),
+    "copy": ("copy",),
+}
+
+# Errors that mean "not possible here", as opposed to a real I/O failure
+UNSUPPORTED = {
+    errno.EXDEV,
+    errno.EINVAL,
+    errno.ENOSYS,
+    errno.ENOTTY,
+    errno.EOPNOTSUPP,
+    errno.ENOTSUP,
+    errno.EBADF,
+    errno.EPERM,
+    errno.EMLINK,
+}
+
+
+def _reflink(source, dest):
+    if fcntl is None or not sys.platform.startswith("linux"):
+        raise OSError(errno.EOPNOTSUPP, "reflink needs Linux FICLONE")
+    with open(source, "rb") as src, open(dest, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def _copy_in_kernel(source, dest, copy_chunk):
+    with open(source, "rb") as src, open(dest, "wb") as dst:
+        size = os.fstat(src.fileno()).st_size
+        offset = 0
+        while offset < size:
+            sent = copy_chunk(src.fileno(), dst.fileno(), offset, size - offset)
+            if sent == 0:
+                raise OSError(errno.EINVAL, "kernel copy made no progress")
+            offset += sent
+
+
+def _copy_file_range(source, dest):
+    if not hasattr(os, "copy_file_range"):
+        raise OSError(errno.ENOSYS, "copy_file_range is not available")
+    _copy_in_kernel(
+        source,
+        dest,
+        lambda src, dst, offset, count: os.copy_file_range(
+            src, dst, count, offset, offset
+        ),
+    )
+
+
+def _sendfile(source, dest):
+    if not hasattr(os, "sendfile"):
+        raise OSError(errno.ENOSYS, "sendfile is not available")
+    _copy_in_kernel(
+        source,
+        dest,
+        lambda src, dst, offset, count: os.sendfile(dst, src, offset, count),
+    )
+
+
+STRATEGIES = {
+    "reflink": _reflink,
+    "copy_file_range": _copy_file_range,
+    "sendfile": _sendfile,
+    "hardlink": os.link,
+    "copy": shutil.copyfile,
+}
+
+
+class FileTransfer:
+    """Copies files with the cheapest strategy the filesystems support.
+
+    stats counts the files each strategy transferred.
+    """
+
+    def __init__(self, mode="auto"):
+        if mode not in TRANSFER_MODES:
+            raise ValueError(f"Unknown transfer mode: {mode}")
+        self.mode = mode
+        self.strategies = TRANSFER_MODES[mode]
+        self.stats = {name: 0 for name in self.strategies}
+        self._unsupported = set()  # (strategy, source dev, dest dev)
+        self._lock = threading.Lock()
+
+    def copy(self, source, dest):
+        """Create dest with source's bytes and mtime; returns the strategy used.
+
+        dest must not exist yet.
+        """
+        devices = (os.stat(source).st_dev, os.stat(os.path.dirname(dest)).st_dev)
+        for name in self.strategies:
+            if (name, *devices) in self._unsupported:
+                continue
+            try:
+                STRATEGIES[name](source, dest)
+            except OSError as e:
+                if name == "copy" or e.errno not in UNSUPPORTED:
+                    raise
+                self._discard(dest)
+                with self._lock:
+                    self._unsupported.add((name, *devices))
+                continue
+
+            # A hard link already shares the source's metadata
+            if name != "hardlink":
+                shutil.copystat(source, dest)
+            with self._lock:
+                self.stats[name] += 1
+            return name
+
+    @staticmethod
+    def _discard(path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def summary(self):
+        """One line naming how many files each strategy transferred."""
+        used = [f"{name} {count}" for name, count in self.stats.items() if count]
+        return ", ".join(used)
@@ -0,0 +1,129 @@
+"""
+Streaming vault walker for markdown notes.
+Walks the vault with os.scandir, never descends into ignored folders and
+yields notes as it finds them. Directory listings are cached by the
+directory's mtime, which changes whenever an entry is added, removed or
+renamed, so an unchanged folder costs one stat instead of a listing.
+"""
+
+import os
+import time
+from fnmatch import fnmatch
+from pathlib import Path
+
+from .attachments import IGNORED_DIRS
+from .state import load_state, save_state
+
+# Listings younger than this may miss a change made in the same mtime tick
+RACY_NS = 2_000_000_000
+
+
+class VaultWalker:
+    """Yields the notes in a vault, skipping ignored folders and files.
+
+    ignore holds fnmatch patterns matched against vault-relative paths and
+    against bare names, e.g. "Templates", "archive/*" or "*.excalidraw.md".
+    """
+
+    VERSION = 1
+
+    def __init__(
+        self,
+        root,
+        ignore=(),
+        ignored_dirs=IGNORED_DIRS,
+        suffix=".md",
+        cache_path=None,
+    ):
+        self.root = Path(root)
+        self.ignore = list(ignore)
+        self.ignored_dirs = set(ignored_dirs)
+        self.suffix = suffix
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.listings = {}  # relative dir -> [mtime_ns, file names, dir names]
+        self.dirty = False
+        self.stats = {"dirs": 0, "listed": 0, "files": 0}
+        self.load()
+
+    def load(self):
+        if self.cache_path is None:
+            return
+        data = load_state(self.cache_path, self.VERSION)
+        if data is not None and data.get("suffix") == self.suffix:
+            self.listings = data.get("listings", {})
+
+    def save(self):
+        if self.cache_path is None or not self.dirty:
+            return
+        save_state(
+            self.cache_path,
+            self.VERSION,
+            {"suffix": self.suffix, "listings": self.listings},
+        )
+        self.dirty = False
+
+    def is_ignored(self, relative, name):
+        return any(
+            fnmatch(relative, pattern) or fnmatch(name, pattern)
+            for pattern in self.ignore
+        )
+
+    def walk(self):
+        """Yield the path of every note, lazily."""
+        seen = {}
+        stack = [""]
+        while stack:
+            relative = stack.pop()
+            listing = self._listing(relative)
+            if listing is None:
+                continue
+            seen[relative] = listing
+            self.stats["dirs"] += 1
+
+            prefix = relative + "/" if relative else ""
+            for name in listing[1]:
+                if not self.is_ignored(prefix + name, name):
+                    self.stats["files"] += 1
+                    yield self.root / (prefix + name)
+            for name in reversed(listing[2]):
+                if name not in self.ignored_dirs and not self.is_ignored(
+                    prefix + name, name
+                ):
+                    stack.append(prefix + name)
+
+        # Only a complete walk may drop listings for folders that are gone
+        if seen.keys() != self.listings.keys():
+            self.dirty = True
+        self.listings = seen
+
+    def _listing(self, relative):
+        path = os.path.join(self.root, relative)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+        cached = self.listings.get(relative)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached
+
+        files, dirs = [], []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.name)
+                    elif entry.name.endswith(self.suffix) and entry.is_file():
+                        files.append(entry.name)
+        except OSError:
+            return None
+        self.stats["listed"] += 1
+
+        # A listing taken in the same tick as a change could miss it; keep
+        # it for this walk but make the next one list the folder again
+        if time.time_ns() - mtime_ns < RACY_NS:
+            mtime_ns = -1
+        listing = [mtime_ns, sorted(files), sorted(dirs)]
+        self.listings[relative] = listing
+        self.dirty = True
+        return listing
@@ -5,190 +5,290 @@ Syncs blog posts from Obsidian vault to Hugo content directory and pushes to Git
 """
 
 import os
-import re
-import shutil
 import argparse
-import subprocess
+from functools import partial
 from pathlib import Path
-from datetime import datetime
 import yaml
 import time
 
-
-class ObsidianHugoSync:
-    def __init__(self, obsidian_blog_path, hugo_content_path, hugo_static_path):
+from obsidian_hugo import (
+    COMMIT_MODES,
+    IGNORED_DIRS,
+    TRANSFER_MODES,
+    CoalescingQueue,
+    JobJournal,
+    QueueingEventHandler,
+    SyncEngine,
+    SyncProfiler,
+    create_image_store,
+    parse_widths,
+)
+
+try:
+    from watchdog.observers import Observer
+except ImportError:  # watch mode falls back to polling
+    Observer = None
+
+
+class ObsidianHugoSync(SyncEngine):
+    bundles = True
+
+    messages = {
+        **SyncEngine.messages,
+        "synced": "✓ Synced: {source.name} -> {dest}",
+        "failed": "✗ Error syncing {source.name}: {error}",
+        "copied": "  ✓ Copied image: {image.name} ({strategy})",
+        "renamed": "✓ Renamed: {old} -> {new}",
+        "rename_failed": "✗ Could not rename {old}: {error}",
+        "removed": "✓ Removed: {path}",
+        "skipped": "  (skipped {count} unchanged posts)",
+        "avoided": "  (avoided {count} writes of identical posts and images)",
+        "transfers": "  Image transfers: {summary}",
+        "errors": "\n✗ {count} posts failed to sync:",
+        "error": "  - {post.name}: {error}",
+        "gc_needs_manifest": "  Image cleanup needs a manifest",
+        "gc_dry_run": "  Would remove {count} unreferenced images",
+        "gc_path": "    {path}",
+        "gc_removed": "  Removed {count} unreferenced images",
+        "nothing_to_commit": "\nNo files to push",
+    }
+
+    def __init__(
+        self,
+        obsidian_blog_path,
+        hugo_content_path,
+        hugo_static_path,
+        manifest_path=None,
+        commit_window=0.0,
+        image_store=None,
+        profiler=None,
+        link_index_path=None,
+        stage_cache_path=None,
+        commit_mode="index",
+    ):
         self.obsidian_blog = Path(obsidian_blog_path)
-        self.hugo_content = Path(hugo_content_path)
-        self.hugo_static = Path(hugo_static_path)
-        self.hugo_images = self.hugo_static / "images"
-
-        # Ensure directories exist
-        self.hugo_content.mkdir(parents=True, exist_ok=True)
-        self.hugo_images.mkdir(parents=True, exist_ok=True)
+        super().__init__(
+            self.obsidian_blog.parent,
+            hugo_content_path,
+            hugo_static_path,
+            manifest_path=manifest_path,
+            commit_window=commit_window,
+            image_store=image_store,
+            profiler=profiler,
+            link_index_path=link_index_path,
+            stage_cache_path=stage_cache_path,
+            commit_mode=commit_mode,
+            push=True,
+        )
 
     def find_blog_posts(self):
         """Find all markdown files in the Obsidian blog posts directory."""
         blog_posts = []
 
         posts_dir = self.obsidian_blog / "posts"
-        if posts_dir.exists():
-            for md_file in posts_dir.glob("*.md"):
-                # Skip index files
-                if not md_file.name.startswith("_"):
-                    blog_posts.append(md_file)
+        with self.profiler.stage("scan") as rec:
+            if posts_dir.exists():
+                for md_file in posts_dir.glob("*.md"):
+                    # Skip index files
+                    if not md_file.name.startswith("_"):
+                        blog_posts.append(md_file)
+            rec.files = len(blog_posts)
+
+        return sorted(blog_posts)
+
+    def resolve_image(self, image_path, source_file):
+        """Return the file an embed points to, or None to leave it alone."""
+        # Site-absolute links are already published. Everything else is
+        # looked up in the vault attachment index (next to the note, in
+        # attaches/, or anywhere by Obsidian's shortest path)
+        if image_path.startswith("/"):
+            return None
+        return super().resolve_image(image_path, source_file)
 
-        return blog_posts
+    def link_slug(self, source_file):
+        """Hugo relref path of the page bundle a note is published as."""
+        return f"/posts/{source_file.stem}"
 
-    def process_images(self, content, source_file):
-        """Process and copy images, updating markdown links."""
-        source_dir = source_file.parent
-        
-        # Pattern to match markdown images: ![alt](path) or ![[path]]
-        image_patterns = [
-            r"!\[([^\]]*)\]\(([^)]+)\)",  # ![alt](path)
-            r"!\[\[([^\]]+)\]\]",  # ![[path]]
+    def announce(self, blog_posts):
+        if not blog_posts:
+            print("No blog posts found in Obsidian blog folder")
+            return
+
+        print(f"\nFound {len(blog_posts)} blog posts to sync:")
+        for post in blog_posts:
+            print(f"  - {post.name}")
+
+        print("\nSyncing posts...")
+
+    def find_changed_posts(self):
+        """Return blog posts whose source, images or output changed since last sync."""
+        return [
+            post
+            for post in self.find_blog_posts()
+            if self.manifest is None
+            or not self.manifest.is_fresh(post, resolve=self.resolve_image)
         ]
 
-        processed_content = content
-
-        for pattern in image_patterns:
-            matches = re.finditer(pattern, content)
-            for match in matches:
-                if pattern.endswith(r"\]\]"):  # Obsidian style ![[image]]
-                    image_path = match.group(1)
-                    alt_text = Path(image_path).stem
-                else:  # Standard markdown ![alt](path)
-                    alt_text = match.group(1)
-                    image_path = match.group(2)
-
-                # Skip if it's already a web URL
-                if image_path.startswith(("http://", "https://", "/")):
-                    continue
-
-                # Try to find the image in attaches folder
-                possible_paths = [
-                    source_dir / image_path,
-                    source_dir.parent.parent / "attaches" / image_path,
-                    source_dir.parent.parent / "attaches" / Path(image_path).name,
-                ]
-
-                source_image = None
-                for path in possible_paths:
-                    if path.exists():
-                        source_image = path
-                        break
-
-                if source_image:
-                    # Create a unique image name
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    image_name = f"{source_file.stem}_{timestamp}_{source_image.name}"
-                    dest_image = self.hugo_images / image_name
-
-                    shutil.copy2(source_image, dest_image)
-
-                    # Update content with new path
-                    hugo_image_path = f"/images/{image_name}"
-                    new_markdown = f"![{alt_text}]({hugo_image_path})"
-
-                    processed_content = processed_content.replace(
-                        match.group(0), new_markdown
-                    )
-                    print(f"  ✓ Copied image: {source_image.name}")
-
-        return processed_content
-
-    def sync_post(self, source_file):
-        """Sync a single blog post from Obsidian to Hugo."""
-        try:
-            content = source_file.read_text(encoding="utf-8")
+    def watch_paths(self):
+        """Return the vault folders that can affect the published posts."""
+        # Embeds can point at attachments anywhere in the vault
+        return [self.attachments.vault_root]
 
-            # Process images
-            content = self.process_images(content, source_file)
+    def source_root(self):
+        return self.obsidian_blog / "posts"
 
-            # Create post bundle directory
-            post_dir = self.hugo_content / "posts" / source_file.stem
-            post_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Write as index.md in the bundle
-            dest_file = post_dir / "index.md"
-            dest_file.write_text(content, encoding="utf-8")
+    def is_post(self, path):
+        """Whether a vault path is (or would be) a blog post."""
+        return (
+            path.suffix == ".md"
+            and not path.name.startswith("_")
+            and os.path.dirname(os.path.abspath(path))
+            == os.path.abspath(self.obsidian_blog / "posts")
+        )
 
-            print(f"✓ Synced: {source_file.name} -> {dest_file}")
-            return dest_file
+    def post_path(self, path):
+        """The posts-folder path of a blog post, or None for other notes."""
+        return super().post_path(path) if self.is_post(path) else None
 
-        except Exception as e:
-            print(f"✗ Error syncing {source_file.name}: {e}")
-            return None
+    def output_path(self, source_file):
+        """The index.md of the bundle a post is published as."""
+        return self.hugo_content / "posts" / source_file.stem / "index.md"
+
+    def sync_posts(self, posts):
+        """Sync the given posts and persist state once for the batch.
 
-    def sync_all(self):
-        """Sync all blog posts from Obsidian to Hugo."""
-        blog_posts = self.find_blog_posts()
+        Posts whose links went stale because of the batch are re-rendered too.
+        """
         synced_files = []
+        for post in posts:
+            result = self.sync_post(post)
+            if result:
+                synced_files.append(result)
 
-        if not blog_posts:
-            print("No blog posts found in Obsidian blog folder")
-            return synced_files
+        for post in self.take_stale_links():
+            result = self.sync_post(post)
+            if result and result not in synced_files:
+                synced_files.append(result)
 
-        print(f"\nFound {len(blog_posts)} blog posts to sync:")
-        for post in blog_posts:
-            print(f"  - {post.name}")
+        self.save_state()
+        return synced_files
 
-        print("\nSyncing posts...")
-        for post in blog_posts:
-            result = self.sync_post(post)
+    def sync_changes(self, changed_paths, moves=()):
+        """Sync a batch of watch events.
+
+        Renamed posts follow their bundles and deleted posts are unpublished
+        before the remaining changes are synced.
+        """
+        synced_files = []
+        moved = set()
+        for old_path, new_path in moves:
+            if new_path.suffix != ".md":
+                continue
+            moved.add(self.post_path(new_path))
+            result = self.move_post(old_path, new_path)
             if result:
                 synced_files.append(result)
 
+        # Event paths are absolute; compare them as tracked posts
+        for path in changed_paths:
+            if path.suffix == ".md" and not path.exists():
+                post = self.post_path(path)
+                if post is not None and post not in moved:
+                    self.remove_post(post)
+
+        posts = [p for p in self.posts_for_changes(changed_paths) if p not in moved]
+        for result in self.sync_posts(posts):
+            if result not in synced_files:
+                synced_files.append(result)
         return synced_files
 
     def git_push(self, synced_files, commit_message=None):
-        """Commit and push changes to GitHub."""
-        if not synced_files:
-            print("\nNo files to push")
-            return False
+        """Commit and push changes to GitHub.
 
-        try:
-            # Check if we're in a git repository
-            subprocess.run(["git", "rev-parse", "--git-dir"], 
-                         check=True, capture_output=True)
-
-            # Add all changes
-            subprocess.run(["git", "add", "."], check=True)
-
-            # Check if there are changes to commit
-            result = subprocess.run(
-                ["git", "status", "--porcelain"], 
-                capture_output=True, text=True
-            )
-            
-            if not result.stdout.strip():
-                print("\nNo changes to commit")
-                return False
-
-            # Create commit message
-            if not commit_message:
-                file_names = [f.parent.name for f in synced_files]
-                if len(file_names) == 1:
-                    commit_message = f"Sync blog post: {file_names[0]}"
-                else:
-                    commit_message = f"Sync {len(file_names)} blog posts from Obsidian"
+        Only the posts and images written by this sync, and the posts and
+        images it removed, are staged. With a commit window, syncs within the window
+        share one commit and push.
+        """
+        return bool(self.commit_changes(synced_files, commit_message))
 
-            # Commit
-            subprocess.run(
-                ["git", "commit", "-m", commit_message], 
-                check=True
-            )
-            print(f"\n✓ Committed: {commit_message}")
 
-            # Push to remote
-            subprocess.run(["git", "push", "origin", "master"], check=True)
-            print("✓ Pushed to GitHub")
+def publish(sync, synced, push):
+    """Push a batch of synced files, or remind the user how to."""
+    if (synced or sync.removed_paths) and push:
+        sync.git_push(synced)
+    elif synced:
+        print(f"\n{len(synced)} files synced. Use --push to push to GitHub.")
 
-            return True
 
-        except subprocess.CalledProcessError as e:
-            print(f"\n✗ Git operation failed: {e}")
-            return False
+def finish_batch(sync, queue, push):
+    """Complete a batch in the journal once its push commit has been made."""
+    if push:
+        sync.publisher.after_commit(partial(queue.done, queue.batch_seq))
+    else:
+        queue.done()
+
+
+def watch_polling(sync, args):
+    """Poll the vault every --interval seconds (fallback when watchdog is missing)."""
+    print(f"Watching for changes every {args.interval} seconds...")
+    print("Press Ctrl+C to stop\n")
+
+    while True:
+        # No events arrive to keep the attachment index current, so new
+        # and renamed images are picked up by rebuilding it
+        sync.attachments.build()
+        publish(sync, sync.sync_posts(sync.find_changed_posts()), args.push)
+        time.sleep(args.interval)
+
+
+def should_sync(path):
+    """Whether a vault event can affect the published posts."""
+    # Hidden files (editor swap files, ...) and Obsidian's own folders
+    # never do; the same rule watch-obsidian.py applies
+    if path.name.startswith("."):
+        return False
+    return not IGNORED_DIRS.intersection(path.parts)
+
+
+def watch_events(sync, args):
+    """Sync from filesystem events, in batches once the vault goes quiet."""
+    journal = JobJournal(Path(args.manifest).with_name("blog-journal.jsonl"))
+    queue = CoalescingQueue(quiet_period=args.debounce, journal=journal)
+    handler = QueueingEventHandler(queue, accept=should_sync)
+    observer = Observer()
+    try:
+        for path in sync.watch_paths():
+            observer.schedule(handler, str(path), recursive=True)
+        observer.start()
+    except OSError as e:
+        # e.g. the inotify watch limit was reached
+        print(f"✗ Could not watch for events ({e}), falling back to polling")
+        watch_polling(sync, args)
+        return
+
+    print(f"Watching {sync.obsidian_blog} for changes...")
+    print("Press Ctrl+C to stop\n")
+
+    try:
+        # Finish what a killed run left in the journal, then catch up on
+        # edits made while the watcher was not running; the manifest
+        # persists what was already published
+        batch = queue.recover()
+        if batch:
+            print(f"Resuming {len(batch)} unfinished changes")
+            publish(sync, sync.sync_changes(batch, queue.take_moves()), args.push)
+            finish_batch(sync, queue, args.push)
+        sync.remove_missing_posts()
+        publish(sync, sync.sync_posts(sync.find_changed_posts()), args.push)
+
+        while True:
+            batch = queue.get_batch()
+            synced = sync.sync_changes(batch, queue.take_moves())
+            publish(sync, synced, args.push)
+            finish_batch(sync, queue, args.push)
+    finally:
+        observer.stop()
+        observer.join()
 
 
 def main():
@@ -224,7 +324,114 @@ def main():
         "--interval",
         type=int,
         default=60,
-        help="Watch interval in seconds (default: 60)",
+        help="Polling interval in seconds when --poll is used (default: 60)",
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="Watch by polling instead of filesystem events",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=2.0,
+        help="Seconds of quiet before a batch of changes is synced (default: 2)",
+    )
+    parser.add_argument(
+        "--manifest",
+        default="./.obsidian-sync/blog-manifest.json",
+        help="Incremental sync manifest (default: ./.obsidian-sync/blog-manifest.json)",
+    )
+    parser.add_argument(
+        "--commit-window",
+        type=float,
+        default=0.0,
+        help="In watch mode, group pushes made within this many seconds (default: 0)",
+    )
+    parser.add_argument(
+        "--commit-mode",
+        choices=COMMIT_MODES,
+        default="index",
+        help="index stages files and runs git commit (with hooks); tree builds "
+        "the commit with git plumbing, without scanning the index (default: index)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of posts to sync in parallel (default: 1)",
+    )
+    parser.add_argument(
+        "--async-io",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Overlap post reads, image copies and writes, N of each at a time "
+        "(default: off)",
+    )
+    parser.add_argument(
+        "--async-window",
+        type=int,
+        metavar="N",
+        help="With --async-io, the most posts in flight at once (default: 4x N)",
+    )
+    parser.add_argument(
+        "--optimize-images",
+        action="store_true",
+        help="Publish images as resized WebP variants (requires Pillow)",
+    )
+    parser.add_argument(
+        "--image-widths",
+        type=parse_widths,
+        default=[480, 960, 1600],
+        help="Comma-separated widths for optimized images (default: 480,960,1600)",
+    )
+    parser.add_argument(
+        "--image-quality",
+        type=int,
+        default=80,
+        help="WebP quality for optimized images (default: 80)",
+    )
+    parser.add_argument(
+        "--image-transfer",
+        choices=sorted(TRANSFER_MODES),
+        default="auto",
+        help="How new images are copied: auto tries reflink, copy_file_range "
+        "and sendfile before a plain copy; hardlink tries a hard link first "
+        "(default: auto)",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Ignore the manifest and re-sync every post",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="./.obsidian-sync/blog-profile.json",
+        metavar="PATH",
+        help="Record per-stage timings and I/O of a one-time sync as a JSON report",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        help="Number of slowest posts to list with --profile (default: 10)",
+    )
+    parser.add_argument(
+        "--gc",
+        action="store_true",
+        help="Delete images that synced posts stopped embedding",
+    )
+    parser.add_argument(
+        "--gc-all",
+        action="store_true",
+        help="Check every sync-published image in static/images (implies --gc)",
+    )
+    parser.add_argument(
+        "--gc-dry-run",
+        action="store_true",
+        help="List the images --gc would delete without deleting them",
     )
 
     args = parser.parse_args()
@@ -233,40 +440,50 @@ def main():
         obsidian_blog_path=args.obsidian_blog,
         hugo_content_path=args.hugo_content,
         hugo_static_path=args.hugo_static,
+        manifest_path=args.manifest,
+        link_index_path=Path(args.manifest).with_name("blog-links.json"),
+        stage_cache_path=Path(args.manifest).with_name("blog-stage-cache"),
+        commit_window=args.commit_window,
+        image_store=create_image_store(
+            Path(args.hugo_static) / "images",
+            optimize=args.optimize_images,
+            widths=args.image_widths,
+            quality=args.image_quality,
+            transfer=args.image_transfer,
+        ),
+        profiler=SyncProfiler() if args.profile else None,
+        commit_mode=args.commit_mode,
     )
 
     if args.watch:
-        print(f"Watching for changes every {args.interval} seconds...")
-        print("Press Ctrl+C to stop\n")
-        
-        last_sync_time = {}
-        
         try:
-            while True:
-                posts = sync.find_blog_posts()
-                synced = []
-                
-                for post in posts:
-                    # Check if file was modified since last sync
-                    mtime = post.stat().st_mtime
-                    if post not in last_sync_time or mtime > last_sync_time[post]:
-                        result = sync.sync_post(post)
-                        if result:
-                            synced.append(result)
-                            last_sync_time[post] = mtime
-                
-                if synced and args.push:
-                    sync.git_push(synced)
-                elif synced:
-                    print(f"\n{len(synced)} files synced. Use --push to push to GitHub.")
-                
-                time.sleep(args.interval)
-                
+            if args.poll or Observer is None:
+                if not args.poll:
+                    print("watchdog is not installed, falling back to polling")
+                watch_polling(sync, args)
+            else:
+                watch_events(sync, args)
+
         except KeyboardInterrupt:
             print("\n\nStopped watching.")
+            if args.push:
+                sync.publisher.flush()
     else:
         # One-time sync
-        synced = sync.sync_all()
+        synced = sync.sync_all(
+            full=args.full,
+            jobs=args.jobs,
+            async_io=args.async_io,
+            window=args.async_window,
+        )
+
+        if args.profile:
+            sync.profiler.write(args.profile)
+            sync.profiler.print_summary(args.profile_top)
+            print(f"Profile written to {args.profile}")
+
+        if args.gc or args.gc_all or args.gc_dry_run:
+            sync.collect_images(dry_run=args.gc_dry_run, sweep=args.gc_all)
         
         if synced:
             print(f"\n✓ Sync completed. {len(synced)} files processed.")
@@ -276,7 +493,9 @@ def main():
             else:
                 print("\nTo push changes to GitHub, run with --push flag")
         else:
-            print("\n✗ No files were synced.")
+            print("\nNo changes to sync.")
+            if sync.removed_paths and args.push:
+                sync.git_push([])
 
 
 if __name__ == "__main__":
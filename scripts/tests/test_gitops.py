@@ -0,0 +1,118 @@
+import subprocess
+
+import pytest
+
+from obsidian_hugo import GitPublisher
+
+
+def git(repo, *args):
+    return subprocess.run(
+        ["git", *args], cwd=repo, check=True, capture_output=True, text=True
+    ).stdout
+
+
+@pytest.fixture
+def repo(tmp_path):
+    git(tmp_path, "init", "-q")
+    git(tmp_path, "config", "user.email", "test@example.com")
+    git(tmp_path, "config", "user.name", "Test")
+    return tmp_path
+
+
+def write(repo, path, text):
+    file = repo / path
+    file.parent.mkdir(parents=True, exist_ok=True)
+    file.write_text(text)
+    return file
+
+
+def tree(repo):
+    """{path: blob contents} of HEAD."""
+    files = git(repo, "ls-tree", "-r", "--name-only", "HEAD").split()
+    return {path: git(repo, "show", f"HEAD:{path}") for path in files}
+
+
+def commit(repo, paths, message="sync"):
+    return GitPublisher(repo, mode="tree").commit_tree(paths, message)
+
+
+def test_first_commit_on_empty_head(repo):
+    write(repo, "content/posts/a.md", "a\n")
+    write(repo, "static/images/x.png", "png\n")
+
+    changed = commit(repo, ["content/posts/a.md", "static/images/x.png"])
+
+    assert changed == ["content/posts/a.md", "static/images/x.png"]
+    assert tree(repo) == {"content/posts/a.md": "a\n", "static/images/x.png": "png\n"}
+    assert git(repo, "rev-list", "--count", "HEAD").strip() == "1"
+    assert git(repo, "status", "--porcelain") == ""
+
+
+def test_add_and_modify_keep_untouched_files(repo):
+    write(repo, "content/posts/a.md", "a\n")
+    write(repo, "content/posts/b.md", "b\n")
+    commit(repo, ["content/posts/a.md", "content/posts/b.md"])
+
+    write(repo, "content/posts/a.md", "a2\n")
+    write(repo, "content/posts/c.md", "c\n")
+    changed = commit(repo, ["content/posts/a.md", "content/posts/c.md"])
+
+    assert changed == ["content/posts/a.md", "content/posts/c.md"]
+    assert tree(repo) == {
+        "content/posts/a.md": "a2\n",
+        "content/posts/b.md": "b\n",
+        "content/posts/c.md": "c\n",
+    }
+    assert git(repo, "rev-list", "--count", "HEAD").strip() == "2"
+
+
+def test_unchanged_paths_make_no_commit(repo):
+    write(repo, "content/posts/a.md", "a\n")
+    commit(repo, ["content/posts/a.md"])
+    head = git(repo, "rev-parse", "HEAD")
+
+    assert commit(repo, ["content/posts/a.md", "content/posts/gone.md"]) == []
+    assert git(repo, "rev-parse", "HEAD") == head
+
+
+def test_delete(repo):
+    write(repo, "content/posts/a.md", "a\n")
+    write(repo, "content/posts/b.md", "b\n")
+    commit(repo, ["content/posts/a.md", "content/posts/b.md"])
+
+    (repo / "content/posts/a.md").unlink()
+    changed = commit(repo, ["content/posts/a.md"])
+
+    assert changed == ["content/posts/a.md"]
+    assert tree(repo) == {"content/posts/b.md": "b\n"}
+    assert git(repo, "status", "--porcelain") == ""
+
+
+def test_removing_the_last_file_drops_nested_folders(repo):
+    write(repo, "content/posts/bundle/index.md", "post\n")
+    write(repo, "content/about.md", "about\n")
+    commit(repo, ["content/posts/bundle/index.md", "content/about.md"])
+
+    (repo / "content/posts/bundle/index.md").unlink()
+    (repo / "content/posts/bundle").rmdir()
+    (repo / "content/posts").rmdir()
+    changed = commit(repo, ["content/posts/bundle/index.md"])
+
+    assert changed == ["content/posts/bundle/index.md"]
+    assert tree(repo) == {"content/about.md": "about\n"}
+    assert "posts" not in git(repo, "ls-tree", "--name-only", "HEAD:content")
+    assert git(repo, "status", "--porcelain") == ""
+
+
+def test_rename(repo):
+    write(repo, "content/posts/old/index.md", "post\n")
+    commit(repo, ["content/posts/old/index.md"])
+
+    (repo / "content/posts/old").rename(repo / "content/posts/new")
+    changed = commit(
+        repo, ["content/posts/old/index.md", "content/posts/new/index.md"]
+    )
+
+    assert changed == ["content/posts/new/index.md", "content/posts/old/index.md"]
+    assert tree(repo) == {"content/posts/new/index.md": "post\n"}
+    assert git(repo, "status", "--porcelain") == ""
@@ -0,0 +1,26 @@
+from obsidian_hugo import ImageCollector, SyncManifest
+
+
+def test_sweep_only_removes_images_the_sync_wrote(tmp_path):
+    images = tmp_path / "images"
+    images.mkdir()
+    source = tmp_path / "post.md"
+    source.write_text("post")
+    image = tmp_path / "a.png"
+    image.write_bytes(b"png")
+    for name in ("0123456789abcdef.png", "deadbeefcafe1234.png", "logo.png"):
+        (images / name).write_bytes(b"png")
+
+    manifest = SyncManifest(tmp_path / "state" / "manifest.json")
+    output = tmp_path / "post.out.md"
+    dest = images / "0123456789abcdef.png"
+    manifest.record(source, "hash", output, "text", [(image, dest)])
+    manifest.forget(source)
+
+    orphans = ImageCollector(images, manifest).collect(sweep=True)
+    assert orphans == [dest]
+    assert sorted(p.name for p in images.iterdir()) == [
+        "deadbeefcafe1234.png",
+        "logo.png",
+    ]
+    assert manifest.published == set()
@@ -0,0 +1,86 @@
+import shutil
+import subprocess
+from functools import partial
+from pathlib import Path
+
+from obsidian_hugo import CoalescingQueue, GitPublisher, JobJournal
+
+
+def kill(journal):
+    """What a killed daemon leaves behind: the file, nothing else."""
+    journal.close()
+
+
+def replayed(path):
+    """What a restart now would replay, without touching the live journal."""
+    copy = path.with_name("restart.jsonl")
+    shutil.copy(path, copy)
+    journal = JobJournal(copy, fsync=False)
+    journal.close()
+    return journal.outstanding()[0]
+
+
+def test_killed_batch_is_replayed(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = JobJournal(path, fsync=False)
+    queue = CoalescingQueue(quiet_period=0, journal=journal)
+    queue.put(Path("vault/a.md"))
+    queue.put_move(Path("vault/b.md"), Path("vault/c.md"))
+    batch = [Path("vault/a.md"), Path("vault/b.md"), Path("vault/c.md")]
+    assert queue.get_batch() == batch
+    kill(journal)  # mid-batch, before done()
+
+    journal = JobJournal(path, fsync=False)
+    queue = CoalescingQueue(quiet_period=0, journal=journal)
+    assert queue.recover() == batch
+    assert queue.take_moves() == [(Path("vault/b.md"), Path("vault/c.md"))]
+    queue.done()
+    kill(journal)
+
+    journal = JobJournal(path, fsync=False)
+    assert journal.outstanding() == ([], [], 0)
+    assert path.read_text() == ""
+    journal.close()
+
+
+def test_batch_stays_outstanding_until_its_commit(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    for args in (
+        ["init", "-q"],
+        ["config", "user.email", "test@example.com"],
+        ["config", "user.name", "Test"],
+    ):
+        subprocess.run(["git", *args], cwd=repo, check=True)
+    (repo / "post.md").write_text("hello\n")
+
+    path = tmp_path / "journal.jsonl"
+    journal = JobJournal(path, fsync=False)
+    queue = CoalescingQueue(quiet_period=0, journal=journal)
+    publisher = GitPublisher(repo, window=3600)
+    queue.put(Path("vault/post.md"))
+    queue.get_batch()
+
+    # The commit window defers the commit, and with it the journal
+    publisher.submit([repo / "post.md"], ["post.md"])
+    publisher.after_commit(partial(queue.done, queue.batch_seq))
+    assert replayed(path) == [Path("vault/post.md")]
+
+    assert publisher.flush()
+    assert replayed(path) == []
+    journal.close()
+
+
+def test_failed_commit_keeps_the_batch_outstanding(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = JobJournal(path, fsync=False)
+    queue = CoalescingQueue(quiet_period=0, journal=journal)
+    publisher = GitPublisher(tmp_path)  # not a git repository
+    queue.put(Path("vault/post.md"))
+    queue.get_batch()
+
+    publisher.submit([tmp_path / "post.md"], ["post.md"])
+    publisher.after_commit(partial(queue.done, queue.batch_seq))
+    assert list(publisher.pending) == ["post.md"]
+    assert replayed(path) == [Path("vault/post.md")]
+    journal.close()
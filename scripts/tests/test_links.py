@@ -0,0 +1,29 @@
+from obsidian_hugo.links import LinkIndex, link_targets, rewrite_wikilinks
+
+NOTE = """See [[One]] and `[[Two]]`.
+
+```markdown
+[[Three]]
+```
+"""
+
+
+def test_links_in_code_are_left_alone():
+    rewritten = rewrite_wikilinks(NOTE, lambda target: f"/posts/{target}")
+    assert '[One]({{< relref "/posts/One" >}})' in rewritten
+    assert "`[[Two]]`" in rewritten
+    assert "\n[[Three]]\n" in rewritten
+    assert link_targets(NOTE) == {"one"}
+
+
+def test_links_only_resolve_to_published_notes(tmp_path):
+    published = set()
+    index = LinkIndex(published=lambda source: source in published)
+    post = tmp_path / "one.md"
+    index.register([post], lambda p: f"/posts/{p.stem}")
+    index.update(tmp_path / "two.md", "/posts/two", [], ["one"])
+    assert index.resolve("One") is None
+
+    published.add(str(post))
+    assert index.mark_published(post) == {tmp_path / "two.md"}
+    assert index.resolve("One") == "/posts/one"
@@ -2,64 +2,265 @@
 """
 File watcher for Obsidian vault to automatically sync changes to Hugo blog.
 Uses inotify to monitor file changes and triggers sync when blog posts are modified.
+The sync engine is imported once and runs in-process on a long-lived worker
+thread, so its manifest and caches stay warm between events.
 """
 
 import os
 import sys
 import time
 import argparse
+import threading
+from functools import partial
 from pathlib import Path
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-import subprocess
 
+from obsidian_hugo import (
+    COMMIT_MODES,
+    IGNORED_DIRS,
+    CoalescingQueue,
+    JobJournal,
+    Metrics,
+    MetricsProfiler,
+    load_sync_engine,
+    serve_metrics,
+)
 
-class ObsidianFileHandler(FileSystemEventHandler):
-    def __init__(self, sync_script_path, hugo_content_path, auto_commit=False):
-        self.sync_script = Path(sync_script_path)
-        self.hugo_content = Path(hugo_content_path)
-        self.auto_commit = auto_commit
-        self.last_sync = {}  # Track last sync times to prevent rapid re-syncing
-        self.cooldown = 2  # seconds
 
-    def should_sync(self, file_path):
-        """Check if file should trigger a sync."""
-        file_path = Path(file_path)
-
-        # Only process markdown files
-        if file_path.suffix != ".md":
-            return False
+class SyncWorker(threading.Thread):
+    """Runs syncs in-process, one batch at a time, off the watchdog observer thread."""
 
-        # Check cooldown to prevent rapid re-syncing
-        now = time.time()
-        if file_path in self.last_sync:
-            if now - self.last_sync[file_path] < self.cooldown:
-                return False
-
-        self.last_sync[file_path] = now
-        return True
+    def __init__(
+        self, sync, auto_commit=False, quiet_period=2.0, journal=None, metrics=None
+    ):
+        super().__init__(name="obsidian-sync-worker", daemon=True)
+        self.sync = sync
+        self.auto_commit = auto_commit
+        self.queue = CoalescingQueue(quiet_period=quiet_period, journal=journal)
+        self.metrics = metrics
+        if metrics is not None:
+            self.describe_metrics(metrics)
+
+    def describe_metrics(self, metrics):
+        """Declare the watcher's metrics; live values are read when scraped."""
+        queue, store = self.queue, self.sync.image_store
+        metrics.describe(
+            "events_received_total",
+            "counter",
+            "Filesystem events received.",
+            lambda: queue.received,
+        )
+        metrics.describe(
+            "events_coalesced_total",
+            "counter",
+            "Events merged into an already queued change.",
+            lambda: queue.coalesced,
+        )
+        metrics.describe(
+            "queue_depth", "gauge", "Changed paths waiting to be synced.", queue.__len__
+        )
+        metrics.describe("batches_total", "counter", "Batches synced.")
+        metrics.describe("batch_failures_total", "counter", "Batches that failed.")
+        metrics.describe(
+            "batch_duration_seconds", "histogram", "Time to sync and commit a batch."
+        )
+        metrics.describe(
+            "publish_latency_seconds",
+            "histogram",
+            "Time from a batch's first event until it was synced and committed.",
+        )
+        metrics.describe("posts_synced_total", "counter", "Notes synced.")
+        metrics.describe("posts_failed_total", "counter", "Notes that failed to sync.")
+        metrics.describe("posts_removed_total", "counter", "Deleted notes unpublished.")
+        metrics.describe(
+            "images_copied_total",
+            "counter",
+            "Images published to static/images.",
+            lambda: store.stats["copied"],
+        )
+        metrics.describe(
+            "images_reused_total",
+            "counter",
+            "Embeds whose image was already published.",
+            lambda: store.stats["reused"],
+        )
+        metrics.describe(
+            "image_transfers_total",
+            "counter",
+            "Images published, by transfer strategy.",
+            lambda: {
+                (("strategy", name),): count
+                for name, count in store.transfer.stats.items()
+            },
+        )
+        metrics.describe("git_commit_seconds", "histogram", "Time to make a commit.")
+        metrics.describe("git_push_seconds", "histogram", "Time to push a commit.")
+        metrics.describe("git_failures_total", "counter", "Failed git operations.")
+        metrics.describe(
+            "last_success_timestamp_seconds",
+            "gauge",
+            "Unix time the last batch finished.",
+        )
+        metrics.describe(
+            "last_error_timestamp_seconds", "gauge", "Unix time of the last error."
+        )
+        metrics.describe(
+            "last_error_info", "gauge", "The last error, in the message label."
+        )
 
-    def sync_file(self, file_path):
-        """Sync a specific file using the sync script."""
+    def record_error(self, message):
+        if self.metrics is not None:
+            self.metrics.set("last_error_timestamp_seconds", time.time())
+            self.metrics.replace("last_error_info", 1, message=message)
+
+    def submit(self, file_path):
+        self.queue.put(Path(file_path))
+
+    def submit_move(self, old_path, new_path):
+        self.queue.put_move(Path(old_path), Path(new_path))
+
+    def stop(self):
+        """Flush whatever is pending, then stop the worker."""
+        self.queue.close()
+        self.join()
+
+    def run(self):
+        self.recover()
+        while True:
+            batch = self.queue.get_batch()
+            if batch is None:
+                return
+            self.sync_batch(batch)
+
+    def recover(self):
+        """Finish what a killed run left behind, then catch up on offline edits."""
+        batch = self.queue.recover()
+        if batch:
+            print(f"♻️ Resuming {len(batch)} unfinished change(s)")
+            self.sync_batch(batch)
+
+        # Unchanged notes are skipped on their manifest fingerprints; notes
+        # deleted or no longer posts are unpublished by sync_all
         try:
-            cmd = ["python3", str(self.sync_script), "--single-file", str(file_path)]
+            synced = self.sync.sync_all()
+            if (synced or self.sync.removed_paths) and self.auto_commit:
+                self.sync.auto_commit(synced)
+        except Exception as e:
+            print(f"❌ Error catching up: {e}")
+
+    def sync_one(self, file_path, synced):
+        result = self.sync.sync_post(file_path)
+        if result:
+            synced.append(result)
+            if self.metrics is not None:
+                self.metrics.inc("posts_synced_total")
+        else:
+            error = self.sync.errors.get(file_path, "unknown error")
+            print(f"❌ Sync failed for {file_path}: {error}")
+            if self.metrics is not None:
+                self.metrics.inc("posts_failed_total")
+            self.record_error(f"{file_path}: {error}")
+
+    def sync_batch(self, batch):
+        """Sync a batch of files with one state save and one commit."""
+        try:
+            started = time.perf_counter()
+            synced = []
+            # Renamed notes take their published post along instead of
+            # being published again under the new name
+            moved = set()
+            for old_path, new_path in self.queue.take_moves():
+                if new_path.suffix == ".md":
+                    moved.add(self.sync.post_path(new_path))
+                    result = self.sync.move_post(old_path, new_path)
+                    if result:
+                        synced.append(result)
+
+            # Deleted notes are unpublished; event paths are absolute, so
+            # they are compared as tracked posts
+            removed = []
+            for path in batch:
+                if path.suffix != ".md" or path.exists():
+                    continue
+                post = self.sync.post_path(path)
+                if post is not None and post not in moved:
+                    if self.sync.remove_post(post):
+                        removed.append(path)
+
+            # Changed notes, plus the notes that embed a changed attachment;
+            # notes that were temporary files or deleted since are dropped
+            posts = [p for p in self.sync.posts_for_changes(batch) if p not in moved]
+            for file_path in posts:
+                self.sync_one(file_path, synced)
+
+            # Then the notes whose [[links]] to this batch resolve differently
+            for file_path in self.sync.take_stale_links():
+                if file_path not in posts:
+                    self.sync_one(file_path, synced)
+
+            self.sync.save_state()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            if removed:
+                print(f"🗑️ Unpublished {len(removed)} deleted note(s)")
+            if synced:
+                print(f"✅ Synced {len(synced)} file(s) in {elapsed_ms:.0f} ms")
+            if (synced or removed) and self.auto_commit:
+                self.sync.auto_commit(synced)
+            self.finish_batch()
+            self.record_batch(started, synced, removed)
 
-            if self.auto_commit:
-                cmd.append("--auto-commit")
+        except Exception as e:
+            print(f"❌ Error syncing batch: {e}")
+            if self.metrics is not None:
+                self.metrics.inc("batch_failures_total")
+            self.record_error(f"batch: {e}")
+
+    def finish_batch(self):
+        """Complete the batch in the journal once its commit has been made.
+
+        With a commit window the commit comes later; until then a killed
+        daemon replays the batch on its next start.
+        """
+        if self.auto_commit:
+            self.sync.publisher.after_commit(
+                partial(self.queue.done, self.queue.batch_seq)
+            )
+        else:
+            self.queue.done()
 
-            result = subprocess.run(
-                cmd, capture_output=True, text=True, cwd=self.sync_script.parent.parent
+    def record_batch(self, started, synced, removed):
+        metrics = self.metrics
+        if metrics is None:
+            return
+        metrics.inc("batches_total")
+        metrics.inc("posts_removed_total", len(removed))
+        metrics.observe("batch_duration_seconds", time.perf_counter() - started)
+        if self.queue.batch_first_event is not None:
+            metrics.observe(
+                "publish_latency_seconds",
+                time.monotonic() - self.queue.batch_first_event,
             )
+        metrics.set("last_success_timestamp_seconds", time.time())
 
-            if result.returncode == 0:
-                print(f"✅ Synced: {file_path}")
-                if result.stdout:
-                    print(f"   {result.stdout.strip()}")
-            else:
-                print(f"❌ Sync failed for {file_path}: {result.stderr}")
 
-        except Exception as e:
-            print(f"❌ Error syncing {file_path}: {e}")
+class ObsidianFileHandler(FileSystemEventHandler):
+    def __init__(self, worker):
+        self.worker = worker
+
+    def should_sync(self, file_path):
+        """Check if file should trigger a sync."""
+        # Notes and attachments count; hidden files and Obsidian's own
+        # folders do not. Bursts are merged by the worker's queue
+        file_path = Path(file_path)
+        if file_path.name.startswith("."):
+            return False
+        return not IGNORED_DIRS.intersection(file_path.parts)
+
+    def sync_file(self, file_path):
+        """Hand a file to the sync worker without blocking the observer."""
+        self.worker.submit(file_path)
 
     def on_modified(self, event):
         if event.is_directory:
@@ -77,6 +278,31 @@ class ObsidianFileHandler(FileSystemEventHandler):
             print(f"📄 New file created: {event.src_path}")
             self.sync_file(event.src_path)
 
+    def on_moved(self, event):
+        if event.is_directory:
+            return
+
+        src_ok = self.should_sync(event.src_path)
+        dest_ok = self.should_sync(event.dest_path)
+        if src_ok and dest_ok:
+            print(f"🔀 File moved: {event.src_path} -> {event.dest_path}")
+            self.worker.submit_move(event.src_path, event.dest_path)
+        elif src_ok:
+            # Moved somewhere that is not synced, e.g. .trash: a deletion
+            print(f"🗑️ File moved away: {event.src_path}")
+            self.sync_file(event.src_path)
+        elif dest_ok:
+            # Saved through a hidden temporary file
+            self.sync_file(event.dest_path)
+
+    def on_deleted(self, event):
+        if event.is_directory:
+            return
+
+        if self.should_sync(event.src_path):
+            print(f"🗑️ File deleted: {event.src_path}")
+            self.sync_file(event.src_path)
+
 
 class ObsidianWatcher:
     def __init__(
@@ -84,12 +310,22 @@ class ObsidianWatcher:
         obsidian_vault_path,
         sync_script_path,
         hugo_content_path,
+        hugo_static_path="./static",
+        manifest_path="./.obsidian-sync/manifest.json",
         auto_commit=False,
+        debounce=2.0,
+        commit_window=0.0,
+        commit_mode="index",
+        metrics_address=None,
     ):
         self.obsidian_vault = Path(obsidian_vault_path)
         self.sync_script = Path(sync_script_path)
         self.hugo_content = Path(hugo_content_path)
+        self.hugo_static = Path(hugo_static_path)
         self.auto_commit = auto_commit
+        self.metrics_address = metrics_address
+        self.metrics = Metrics() if metrics_address else None
+        self.metrics_server = None
 
         if not self.obsidian_vault.exists():
             raise FileNotFoundError(f"Obsidian vault not found: {self.obsidian_vault}")
@@ -97,21 +333,45 @@ class ObsidianWatcher:
         if not self.sync_script.exists():
             raise FileNotFoundError(f"Sync script not found: {self.sync_script}")
 
-        self.observer = Observer()
-        self.handler = ObsidianFileHandler(
-            sync_script_path=self.sync_script,
+        engine = load_sync_engine(self.sync_script)
+        self.sync = engine.ObsidianHugoSync(
+            obsidian_vault_path=self.obsidian_vault,
             hugo_content_path=self.hugo_content,
+            hugo_static_path=self.hugo_static,
+            manifest_path=manifest_path,
+            classify_cache_path=Path(manifest_path).with_name("classify-cache.json"),
+            link_index_path=Path(manifest_path).with_name("links.json"),
+            stage_cache_path=Path(manifest_path).with_name("stage-cache"),
+            commit_window=commit_window,
+            commit_mode=commit_mode,
+            profiler=MetricsProfiler(self.metrics) if self.metrics else None,
+        )
+        self.sync.publisher.metrics = self.metrics
+
+        self.observer = Observer()
+        self.worker = SyncWorker(
+            self.sync,
             auto_commit=self.auto_commit,
+            quiet_period=debounce,
+            journal=JobJournal(Path(manifest_path).with_name("journal.jsonl")),
+            metrics=self.metrics,
         )
+        self.handler = ObsidianFileHandler(self.worker)
 
     def start_watching(self):
         """Start watching the Obsidian vault for changes."""
         self.observer.schedule(self.handler, str(self.obsidian_vault), recursive=True)
 
+        if self.metrics is not None:
+            self.metrics_server = serve_metrics(self.metrics, self.metrics_address)
+
+        self.worker.start()
         self.observer.start()
 
         print(f"🔍 Watching Obsidian vault: {self.obsidian_vault}")
         print(f"📝 Auto-commit: {'enabled' if self.auto_commit else 'disabled'}")
+        if self.metrics_server is not None:
+            print(f"📈 Metrics: {self.metrics_address}")
         print("🚀 Press Ctrl+C to stop")
 
         try:
@@ -124,6 +384,12 @@ class ObsidianWatcher:
         """Stop watching and cleanup."""
         self.observer.stop()
         self.observer.join()
+        self.worker.stop()
+        if self.auto_commit:
+            self.sync.publisher.flush()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+            self.metrics_server.server_close()
         print("\n🛑 Stopped watching Obsidian vault")
 
 
@@ -144,9 +410,41 @@ def main():
     parser.add_argument(
         "--hugo-content", default="./content", help="Path to Hugo content directory"
     )
+    parser.add_argument(
+        "--hugo-static", default="./static", help="Path to Hugo static directory"
+    )
+    parser.add_argument(
+        "--manifest",
+        default="./.obsidian-sync/manifest.json",
+        help="Path to the incremental sync manifest",
+    )
     parser.add_argument(
         "--auto-commit", action="store_true", help="Automatically commit changes to git"
     )
+    parser.add_argument(
+        "--commit-window",
+        type=float,
+        default=0.0,
+        help="Group auto-commits made within this many seconds into one",
+    )
+    parser.add_argument(
+        "--commit-mode",
+        choices=COMMIT_MODES,
+        default="index",
+        help="index stages files and runs git commit (with hooks); tree builds "
+        "the commit with git plumbing, without scanning the index",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=2.0,
+        help="Seconds of quiet before a batch of changes is synced",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="ADDRESS",
+        help="Serve Prometheus metrics on [HOST:]PORT or unix:PATH",
+    )
 
     args = parser.parse_args()
 
@@ -155,7 +453,13 @@ def main():
             obsidian_vault_path=args.obsidian_vault,
             sync_script_path=args.sync_script,
             hugo_content_path=args.hugo_content,
+            hugo_static_path=args.hugo_static,
+            manifest_path=args.manifest,
             auto_commit=args.auto_commit,
+            debounce=args.debounce,
+            commit_window=args.commit_window,
+            commit_mode=args.commit_mode,
+            metrics_address=args.metrics,
         )
 
         watcher.start_watching()